@@ -1,7 +1,8 @@
 # -*- coding: utf-8
 """Detects and interactively deactivates duplicate Apt source entries and
 deletes sources list files without valid enabled source entries in
-'/etc/sources.list' and '/etc/sources.list.d/*.list'.
+'/etc/sources.list', '/etc/sources.list.d/*.list' and
+'/etc/sources.list.d/*.sources'.
 
 
 Author: David P. W. Foerster
@@ -11,40 +12,381 @@
 """
 
 
-__all__ = ('get_duplicates', 'get_empty_files')
+__all__ = (
+	'get_duplicates', 'get_overlaps', 'get_keyed_entries', 'get_scheme_rank',
+	'get_empty_files', 'SourceKey', 'Overlap')
 
-from .util.import_check import import_check
-from .util.relations import EquivalenceRelation
-from collections import defaultdict
+from .util.relations import EquivalenceRelation, HostEquivalenceRelation
+from .util.functools import lru_cache, LazyInstance, partial as fpartial
+from .util.operator import identity, itemgetter1
+from collections import defaultdict, namedtuple
 from os.path import normpath
-from urllib.parse import urlparse
-aptsources = import_check('aptsources.sourceslist', 'apt')
+from urllib.parse import urlparse, urlunparse
+from sys import intern
+import time
+
+
+def _import_aptsources():
+	"""Imports 'aptsources.sourceslist' with the diagnostics of import_check()
+
+	and records the duration in 'aptsources_import_time'. The duration is
+	printed to standard error if 'report_import_time' is true.
+	"""
+
+	global aptsources_import_time
+	from .util.import_check import import_check
+
+	start = time.perf_counter()
+	module = import_check('aptsources.sourceslist', 'apt')
+	aptsources_import_time = time.perf_counter() - start
+
+	if report_import_time:
+		from .util.terminal import termwrap
+		termwrap.stderr().print(
+			"Debug: import_check('aptsources.sourceslist') took {:.3f} ms"
+				.format(aptsources_import_time * 1e3))
+	return module
+
+
+# The 'aptsources' package with its 'sourceslist' module; imported on first
+# use only because the initialization of 'apt_pkg' is expensive.
+aptsources = LazyInstance(_import_aptsources)
+aptsources_import_time = None
+report_import_time = False
 
 
 from .util.version import get_version as __version__
 __version__ = str(__version__())
 
 
-def get_duplicates(sourceslist, equivalent_schemes=EquivalenceRelation.EMPTY):
-	"""Detects and returns duplicate Apt source entries."""
+def get_duplicates(sourceslist, equivalent_schemes=EquivalenceRelation.EMPTY,
+	*, streaming=False, keys=False, equivalent_hosts=None
+):
+	"""Detects and returns duplicate Apt source entries.
+
+	By default all source entries are grouped before the first set of duplicates
+	is returned. If 'streaming' is true, sets of duplicates are yielded as soon
+	as their first entry is known to remain the first after sorting by scheme
+	equivalence class (see get_scheme_rank()). The same first entry may then
+	head multiple yielded sets. Yielded sets of duplicates whose first entry
+	could change are held back until all source entries were inspected.
+
+	If 'keys' is true, pairs of the shared SourceKey and the set of duplicates
+	are returned instead.
+
+	Source entries whose hosts belong to the same class of 'equivalent_hosts'
+	(see HostEquivalenceRelation) are duplicates of each other too.
+	"""
 
 	if equivalent_schemes is None:
 		equivalent_schemes = EquivalenceRelation.EMPTY
 
-	sentry_map = defaultdict(list)
+	keyed_entries = get_keyed_entries(
+		sourceslist, equivalent_schemes, equivalent_hosts)
+	if streaming:
+		keyed_dupe_sets = _get_duplicates_streaming(
+			keyed_entries, equivalent_schemes)
+	else:
+		sentry_map = defaultdict(list)
+		for key, se in keyed_entries:
+			sentry_map[key].append(se)
+		keyed_dupe_sets = filter(
+			lambda item: len(item[1]) > 1, sentry_map.items())
+
+	return keyed_dupe_sets if keys else map(itemgetter1, keyed_dupe_sets)
+
+
+class Overlap(namedtuple('OverlapBase',
+	('key', 'first', 'second', 'relation', 'components', 'redundant'))
+):
+	"""A pair of source entries with overlapping components
+
+	'key' is the component-less SourceKey that both entries share and 'first'
+	the entry that is kept. 'relation' describes the components of 'second'
+	relative to those of 'first' and 'components' holds the shared components.
+	'redundant' tells whether 'second' may be disabled (see get_overlaps()).
+	"""
+
+	__slots__ = ()
+
+	EQUAL = 'equal'
+	SUBSET = 'subset'
+	SUPERSET = 'superset'
+	PARTIAL = 'partial'
+
+
+def get_overlaps(sourceslist, equivalent_schemes=EquivalenceRelation.EMPTY,
+	*, streaming=False, equivalent_hosts=None
+):
+	"""Detects pairs of source entries with overlapping components
+
+	Valid source entries are indexed by type, canonical URI and suite. The
+	components of each entry are stored as a bit set over a vocabulary of all
+	components seen so far so that subset, superset and partial overlaps are
+	found with bitwise operations. Each component is kept in the first entry
+	by scheme rank (see get_scheme_rank()) and every other entry with some of
+	its components yields one Overlap record with the kept entry, however many
+	components they share. Entries of the same origin aren't paired.
+
+	Entries of a deb822 stanza can only be disabled together with the whole
+	stanza. They are redundant only if every component of every entry of the
+	stanza is kept elsewhere and they are yielded after all other pairs.
+
+	If 'streaming' is true, pairs are yielded as soon as their first entry is
+	known to remain the first, i. e. if its scheme has the lowest rank. See
+	get_duplicates() for the other arguments.
+	"""
+
+	if equivalent_schemes is None:
+		equivalent_schemes = EquivalenceRelation.EMPTY
+	rank = fpartial(get_scheme_rank, equivalent_schemes)
+
+	vocabulary = {}
+	entry_bits = {}
+	# Per index key the bit set of all components whose first entry is known and
+	# the pairs of those entries and the components they keep
+	keepers = defaultdict(lambda: [0, []])
+	# Per index key the entries with components whose first entry is unknown
+	pending = defaultdict(list)
+	# Per stanza its valid entries and the pairs with those entries
+	stanza_entries = defaultdict(list)
+	stanza_pairs = defaultdict(list)
+
+	def make_overlap(key, first, second, common):
+		if not common or first.origin is second.origin:
+			return ()
+		overlap = Overlap(key, first, second,
+			_get_overlap_relation(
+				entry_bits[id(first)], entry_bits[id(second)], common),
+			tuple(filter(None, _get_bit_set_members(vocabulary, common))),
+			True)
+		if second.origin is second:
+			return (overlap,)
+		stanza_pairs[id(second.origin)].append((overlap, common))
+		return ()
+
+	for se in filter(is_valid, sourceslist.list):
+		se.parsed_uri, base_key, keys = _normalize_source_entry(
+			se.type, se.uri, se.dist, tuple(se.comps), equivalent_schemes,
+			equivalent_hosts or HostEquivalenceRelation.EMPTY)
+		bits = 0
+		for key in keys:
+			bits |= 1 << vocabulary.setdefault(key.component, len(vocabulary))
+		entry_bits[id(se)] = bits
+		if se.origin is not se:
+			stanza_entries[id(se.origin)].append(se)
+
+		kept = keepers[base_key]
+		for first, first_bits in kept[1]:
+			yield from make_overlap(base_key, first, se, first_bits & bits)
+
+		bits &= ~kept[0]
+		if bits and streaming and not rank(se):
+			kept[0] |= bits
+			kept[1].append((se, bits))
+			for other in pending[base_key]:
+				yield from make_overlap(
+					base_key, se, other, bits & entry_bits[id(other)])
+		elif bits:
+			pending[base_key].append(se)
+
+	for base_key, entries in pending.items():
+		seen = keepers[base_key][0]
+		entries.sort(key=rank)
+		for i, first in enumerate(entries):
+			first_bits = entry_bits[id(first)] & ~seen
+			seen |= first_bits
+			if first_bits:
+				for second in entries[i+1:]:
+					yield from make_overlap(
+						base_key, first, second, first_bits & entry_bits[id(second)])
+
+	for origin, pairs in stanza_pairs.items():
+		covered = defaultdict(int)
+		for overlap, common in pairs:
+			covered[id(overlap.second)] |= common
+		redundant = all(
+			covered[id(se)] == entry_bits[id(se)] for se in stanza_entries[origin])
+		for overlap, _ in pairs:
+			yield overlap._replace(redundant=redundant)
+
+
+def _get_overlap_relation(a, b, common):
+	if a == b:
+		return Overlap.EQUAL
+	if common == b:
+		return Overlap.SUBSET
+	if common == a:
+		return Overlap.SUPERSET
+	return Overlap.PARTIAL
+
+
+def _get_bit_set_members(vocabulary, bits):
+	return (item for item, i in vocabulary.items() if bits >> i & 1)
+
+
+def get_keyed_entries(sourceslist, equivalent_schemes, equivalent_hosts=None):
+	"""Yields pairs of duplicate detection keys and valid source entries
+
+	with one pair for each component of a source entry.
+	"""
+
 	for se in filter(is_valid, sourceslist.list):
-		uri = se.parsed_uri = urlparse(se.uri, "file")
-		uri = uri._replace(
-			# Abuse the scheme attribute to store its equivalence class (if any)
-			# which is fine as long as the result doesn't leak outside of this
-			# function.
-			scheme=equivalent_schemes.get_class(uri.scheme) or uri.scheme,
-			path=normpath(uri.path))
-		dist = normpath(se.dist)
-		for component in (map(normpath, se.comps) if se.comps else (None,)):
-			sentry_map[(se.type, uri, dist, component)].append(se)
-
-	return filter(lambda dupe_set: len(dupe_set) > 1, sentry_map.values())
+		se.parsed_uri, _, keys = _normalize_source_entry(
+			se.type, se.uri, se.dist, tuple(se.comps), equivalent_schemes,
+			equivalent_hosts or HostEquivalenceRelation.EMPTY)
+		for key in keys:
+			yield (key, se)
+
+
+NORMALIZATION_CACHE_SIZE = 1 << 12
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _normalize_source_entry(type, uri, dist, comps, equivalent_schemes,
+	equivalent_hosts=HostEquivalenceRelation.EMPTY
+):
+	"""Returns the parsed URI and the duplicate detection keys of a source entry
+
+	The result is a triple of the parsed URI, the component-less key and the
+	sequence of keys of each component. The results are memoized based on the
+	raw field values because the same few mirror URIs and suites tend to appear
+	in many source entries.
+	"""
+
+	parsed_uri = urlparse(uri, "file")
+	scheme_class = equivalent_schemes.get_class(parsed_uri.scheme)
+	uri = urlunparse(parsed_uri._replace(
+		scheme=(
+			_get_scheme_class_representative(scheme_class)
+				if scheme_class is not None
+				else parsed_uri.scheme),
+		netloc=_get_canonical_netloc(parsed_uri, equivalent_hosts),
+		path=normpath(parsed_uri.path)))
+	dist = normpath(dist)
+	base_key = _intern_key(SourceKey(type, uri, dist))
+
+	return (parsed_uri, base_key, tuple(
+		_intern_key(SourceKey(type, uri, dist, component))
+		for component in map(normpath, comps)) if comps else (base_key,))
+
+
+def _get_canonical_netloc(parsed_uri, equivalent_hosts):
+	"""Returns the network location of a parsed URI with its host name replaced
+	by the representative of its equivalence class (if any)
+	"""
+
+	netloc = parsed_uri.netloc
+	if not equivalent_hosts:
+		return netloc
+	host = equivalent_hosts.get_representative(parsed_uri.hostname)
+	if host is None:
+		return netloc
+
+	userinfo, at, hostport = netloc.rpartition('@')
+	if hostport.startswith('['):
+		port = hostport.partition(']')[2]
+	else:
+		port = hostport[hostport.index(':'):] if ':' in hostport else ''
+	return ''.join((userinfo, at, host, port))
+
+
+def _get_scheme_class_representative(scheme_class):
+	"""Returns the same member of a scheme equivalence class on every call
+
+	namely the first scheme of ordered classes or the least otherwise.
+	"""
+
+	index = getattr(scheme_class, "index", None)
+	return min(scheme_class, key=index) if index is not None else min(scheme_class)
+
+
+# Returns the first-seen (and still cached) key equal to its argument so that
+# equal keys of different raw source entries share the same object.
+_intern_key = lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)(identity)
+
+
+class SourceKey:
+	"""A compact duplicate detection key for a single component of a source entry
+
+	The URI is in its canonical form with the scheme and the host name replaced
+	by the representatives of their equivalence classes (if any). All string
+	fields are interned and the hash value is computed once.
+	"""
+
+	__slots__ = ('type', 'uri', 'dist', 'component', '_hash')
+
+
+	def __init__(self, type, uri, dist, component=None):
+		self.type = intern(type)
+		self.uri = intern(uri)
+		self.dist = intern(dist)
+		self.component = component and intern(component)
+		self._hash = hash(self._astuple())
+
+
+	def _astuple(self):
+		return (self.type, self.uri, self.dist, self.component)
+
+
+	def __hash__(self):
+		return self._hash
+
+
+	def __eq__(self, other):
+		if self is other:
+			return True
+		if not isinstance(other, SourceKey):
+			return NotImplemented
+		return self._hash == other._hash and self._astuple() == other._astuple()
+
+
+	def __str__(self):
+		return ' '.join(filter(None, self._astuple()))
+
+
+	def __repr__(self):
+		return '{.__qualname__:s}({:s})'.format(
+			type(self), ', '.join(map(repr, self._astuple())))
+
+
+def _get_duplicates_streaming(keyed_entries, equivalent_schemes):
+	keepers = {}
+	pending = {}
+
+	for key, se in keyed_entries:
+		keeper = keepers.get(key)
+		if keeper is not None:
+			yield (key, [keeper, se])
+			continue
+
+		dupe_set = pending.get(key)
+		if dupe_set is None:
+			dupe_set = pending[key] = [se]
+		else:
+			dupe_set.append(se)
+
+		# No later entry can precede an entry of the lowest possible rank.
+		if not get_scheme_rank(equivalent_schemes, se):
+			keepers[key] = se
+			del pending[key]
+			if len(dupe_set) > 1:
+				yield (key, dupe_set)
+
+	yield from filter(lambda item: len(item[1]) > 1, pending.items())
+
+
+def get_scheme_rank(equivalent_schemes, se):
+	"""Returns the position of the URI scheme of a source entry
+
+	inside its ordered equivalence class or 0 if there is no such class.
+	"""
+
+	scheme = se.parsed_uri.scheme
+	scheme_class = equivalent_schemes.get_class(scheme)
+	if scheme_class is not None and getattr(scheme_class, "index", None) is not None:
+		return scheme_class.index(scheme)
+	return 0
 
 
 def get_empty_files(sourceslist):
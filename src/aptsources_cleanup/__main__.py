@@ -8,6 +8,7 @@
 from .util.strings import *
 from .util.io import *
 from . import *
+from .sources import SourcesListView
 import sys
 import os.path
 import itertools
@@ -16,7 +17,6 @@
 import textwrap
 from itertools import starmap
 from functools import reduce, partial as fpartial
-import aptsources.sourceslist
 import aptsources_cleanup
 
 
@@ -33,27 +33,99 @@ def main(args=None):
 	if args is None:
 		args = sys.argv[1:]
 	args = parse_args(args)
+	aptsources_cleanup.report_import_time = args.debug_import_time
+	if args.debug_profile is not None:
+		return run_profiled(fpartial(run, args),
+			args.debug_profile, args.debug_profile_top)
+	return run(args)
+
+
+def run(args):
+	"""Runs the program with parsed arguments; see main()."""
+
 	if args.debug_import_fail:
 		from .util.import_check import import_check
 		import_check('aptsources.sourceslist', 'apt', None, args.debug_import_fail)
 
-	sourceslist = aptsources.sourceslist.SourcesList(False)
+	policy = None
+	if args.empty_files_policy is not None:
+		from .policy import EmptyFilePolicy
+		try:
+			policy = EmptyFilePolicy.load(args.empty_files_policy)
+		except (EnvironmentError, ValueError) as ex:
+			termwrap.stderr().print('{:s}: {!s}'.format(_('Error'), ex))
+			return 1
+
+	if args.roots:
+		return handle_roots(args.roots, args.equivalent_schemes,
+			args.workers, args.chunksize, args.equivalent_hosts)
+
+	if args.watch:
+		return handle_watch(args.debug_sources_dir, args.equivalent_schemes,
+			args.format, args.equivalent_hosts)
+
+	sourceslist = SourcesListView()
+	cache = None
+	if args.scan_cache is not None:
+		from .scancache import ScanCache, get_default_path
+		if args.scan_cache is DEFAULT_SCAN_CACHE:
+			args.scan_cache = get_default_path()
+		cache = ScanCache.load(args.scan_cache, args.scan_cache_hash)
 
 	rv = 0
 	if args.debug_sources_dir is not None:
-		rv = load_sources_dir(sourceslist, args.debug_sources_dir)
+		rv = load_sources_dir(
+			sourceslist, args.debug_sources_dir, args.jobs, cache)
+	else:
+		sourceslist.refresh(args.jobs, cache)
+
+	if cache is not None:
+		cache.save()
+
+	if rv == 0 and args.diff:
+		return handle_diff(sourceslist, args.equivalent_schemes,
+			not args.debug_no_streaming, policy, args.equivalent_hosts)
+
+	if rv == 0 and args.format != 'text':
+		return handle_records(sourceslist, args.format,
+			args.apply_changes, args.equivalent_schemes,
+			not args.debug_no_streaming, policy, args.equivalent_hosts)
 
 	if rv == 0:
 		rv = handle_duplicates(sourceslist,
-			args.apply_changes, args.equivalent_schemes)
+			args.apply_changes, args.equivalent_schemes,
+			not args.debug_no_streaming, args.equivalent_hosts)
 
 	if rv == 0 and args.apply_changes is not False:
-		rv = handle_empty_files(sourceslist)
+		rv = handle_empty_files(sourceslist, policy)
 
 	return rv
 
 
-def load_sources_dir(sourceslist, dirname):
+def run_profiled(func, path, top=30):
+	"""Runs func() under cProfile and returns its result
+
+	The profile is written to 'path' in the 'pstats' format and the 'top'
+	functions with the highest cumulative time are printed to standard error,
+	even if func() raises an exception.
+	"""
+
+	import cProfile
+	import pstats
+
+	profile = cProfile.Profile()
+	try:
+		return profile.runcall(func)
+	finally:
+		try:
+			profile.dump_stats(path)
+		except EnvironmentError as ex:
+			termwrap.stderr().print('{:s}: {!s}'.format(_('Warning'), ex))
+		pstats.Stats(profile, stream=sys.stderr).sort_stats('cumulative') \
+			.print_stats(top)
+
+
+def load_sources_dir(sourceslist, dirname, jobs=1, cache=None):
 	if not os.path.isdir(dirname):
 		termwrap.stderr().print(': '.join(
 			(_('Error'), _('No such directory'), dirname)))
@@ -61,8 +133,11 @@ def load_sources_dir(sourceslist, dirname):
 
 	import glob
 	sourceslist.list.clear()
-	foreach(sourceslist.load,
-		glob.iglob(os.path.join(dirname, "**/*.list"), recursive=True))
+	sourceslist.load_all(
+		itertools.chain.from_iterable(
+			glob.iglob(os.path.join(dirname, pattern), recursive=True)
+			for pattern in ("**/*.list", "**/*.sources")),
+		jobs, cache)
 	return 0
 
 
@@ -192,6 +267,12 @@ def __call__(self, parser, namespace, values, option_string):
 		parser.exit()
 
 
+# The value of --scan-cache without an argument; resolved to the path of
+# scancache.get_default_path() in run() so that parse_args() doesn't import
+# the 'scancache' module.
+DEFAULT_SCAN_CACHE = object()
+
+
 def parse_args(args):
 	suppress_debug = (
 		None if args and '--help-debug' in args else argparse.SUPPRESS)
@@ -223,6 +304,81 @@ def parse_args(args):
 			'delimited by commas (","). Defaults to "{:|,|;|a}". The empty argument '
 			'disables this feature.')
 				.format(noarg_equivalent_schemes))
+	ap.add_argument('--equivalent-hosts', metavar='HOSTS',
+		type=HostEquivalenceRelation.parse,
+		default=HostEquivalenceRelation.EMPTY,
+		help=_('Specify host names that you consider equivalent, e.g. mirrors of '
+			'the same archive, using a list of equivalence classes delimited by '
+			'semicolons (";") and elements delimited by commas (","). Elements may '
+			'be host name patterns where "*" matches a single label, a leading '
+			'"*." one or more labels and a leading "." zero or more labels. '
+			'Duplicates are reported with the first element of their class. '
+			'Disabled by default.'))
+	ap.add_argument('--equivalent-schemes-from', metavar='FILE',
+		help=_('Read URI scheme equivalence classes from FILE instead of '
+			'--equivalent-schemes. FILE holds one class per line with elements '
+			'delimited by commas or white space; lines sharing an element are '
+			'merged. FILE may also be a compiled relation file.'))
+	ap.add_argument('--equivalent-hosts-from', metavar='FILE',
+		help=_('Read host name equivalence classes from FILE instead of '
+			'--equivalent-hosts in the same format as --equivalent-schemes-from.'))
+	ap.add_argument('--diff',
+		action='store_true', default=False,
+		help=_("Never apply changes; print a unified diff of the changes to the "
+			"sources list files instead. Without --empty-files-policy all files "
+			"without valid and enabled entries are shown as removed together with "
+			"their '.save' companions. File names are relative to '/' so that "
+			"'patch -p1' applies the diff there."))
+	ap.add_argument('--watch',
+		action='store_true', default=False,
+		help=_('Keep running and report changes to the sets of duplicate entries '
+			'whenever sources list files are added, changed or removed. Never '
+			'apply changes.'))
+	ap.add_argument('--format',
+		choices=('text', 'json', 'ndjson'), default='text',
+		help=_("Print a report in this format. 'json' and 'ndjson' print one "
+			"record for each pair of overlapping entries and each empty sources list "
+			"file and never ask questions. Defaults to '{default:s}'.")
+				.format(default='text'))
+	ap.add_argument('--empty-files-policy', metavar='FILE',
+		help=_('Decide whether to remove sources list files without valid and '
+			'enabled entries according to the rules in FILE instead of asking. See '
+			"the documentation of the '{module:s}' module for the rule format.")
+				.format(module='aptsources_cleanup.policy'))
+	ap.add_argument('-j', '--jobs', metavar='N',
+		type=int, default=1,
+		help=_('Read up to N sources list files concurrently. Defaults to '
+			'{default:d}.').format(default=1))
+	ap.add_argument('--scan-cache', metavar='FILE',
+		nargs='?', const=DEFAULT_SCAN_CACHE,
+		help=_("Reuse the parsed entries of unchanged sources list files from the "
+			"last run stored in FILE. If omitted FILE defaults to '{const:s}' "
+			"below '$XDG_CACHE_HOME' or '~/.cache'.")
+				.format(const='aptsources-cleanup/scan-cache'))
+	ap.add_argument('--scan-cache-hash',
+		action='store_true', default=False,
+		help=_('Also compare a hash of the file content to tell whether a cached '
+			'sources list file changed.'))
+	rg = ap.add_argument_group(_('Multiple Root File Systems'),
+		_('Scan the sources list files of many root file systems (e. g. chroots '
+			'or container images) and print one report without changing '
+			'anything.'))
+	rg.add_argument('--root', metavar='DIR',
+		dest='roots', action='append', default=[],
+		help=_('Scan the root file system at DIR. May be repeated.'))
+	rg.add_argument('--roots-from', metavar='FILE',
+		type=argparse.FileType('r'),
+		help=_("Scan the root file systems listed in FILE, one per line. Use '-' "
+			"for standard input."))
+	rg.add_argument('--workers', metavar='N',
+		type=int,
+		help=_('Scan up to N root file systems in parallel processes. Defaults '
+			'to the number of CPUs.'))
+	rg.add_argument('--chunksize', metavar='N',
+		type=int, default=1,
+		help=_('Hand N root file systems at a time to each process. Defaults to '
+			'{default:d}.').format(default=1))
+
 	ap.add_argument('-h', '--help',
 		action='help', default=argparse.SUPPRESS,
 		help=_('show this help message and exit'))
@@ -248,6 +404,29 @@ def parse_args(args):
 		action='store_true', default=False,
 		help=suppress_debug or
 			_('Debug the display of translated and formatted choices options.'))
+	dg.add_argument('--debug-no-streaming', '--d-n-s',
+		action='store_true', default=False,
+		help=suppress_debug or
+			_('Detect all duplicate entries before reporting the first one.'))
+	debug_profile = 'aptsources-cleanup.pstats'
+	dg.add_argument('--debug-profile', '--d-p', metavar='FILE',
+		nargs='?', const=debug_profile,
+		help=suppress_debug or
+			_("Run the program under cProfile, write the profile to FILE and print "
+					"the functions with the highest cumulative time to standard error. "
+					"If omitted FILE defaults to '{const:s}'.")
+				.format(const=debug_profile))
+	dg.add_argument('--debug-profile-top', metavar='N',
+		type=int, default=30,
+		help=suppress_debug or
+			_('Print the top N functions of the profile. Defaults to '
+				'{default:d}.').format(default=30))
+	dg.add_argument('--debug-import-time', '--d-i-t',
+		action='store_true', default=False,
+		help=suppress_debug or
+			_("Print how long the import of the '{module:s}' module takes if it is "
+					"needed.")
+				.format(module='aptsources.sourceslist'))
 	dg.add_argument('--help-debug',
 		action='help', default=argparse.SUPPRESS,
 		help=_('Show help for debugging options.'))
@@ -258,6 +437,26 @@ def parse_args(args):
 			_('unrecognized arguments: %s') % ' '.join(unkown),
 			_("Use '{help_opt:s}' to display the program help.")
 				.format(help_opt='--help'))))
+	for name in ('jobs', 'workers', 'chunksize'):
+		value = getattr(args, name)
+		if value is not None and value < 1:
+			ap.error(_('The number of {name:s} must be positive: {value:d}')
+				.format(name=name, value=value))
+
+	try:
+		if args.equivalent_schemes_from is not None:
+			args.equivalent_schemes = EquivalenceRelation.load(
+				args.equivalent_schemes_from, settype="ordered")
+		if args.equivalent_hosts_from is not None:
+			args.equivalent_hosts = HostEquivalenceRelation.load(
+				args.equivalent_hosts_from)
+	except (EnvironmentError, ValueError) as ex:
+		ap.error(str(ex))
+
+	if args.roots_from is not None:
+		from .fleet import read_roots
+		with args.roots_from:
+			args.roots.extend(read_roots(args.roots_from))
 
 	Choices.debug = args.debug_choices_print
 
@@ -265,9 +464,13 @@ def parse_args(args):
 
 
 def handle_duplicates(sourceslist, apply_changes=None,
-	equivalent_schemes=None
+	equivalent_schemes=None, streaming=True, equivalent_hosts=None
 ):
-	"""Interactive disablement of duplicate source entries"""
+	"""Interactive disablement of duplicate source entries
+
+	Each pair of overlapping entries is reported and acted upon as soon as
+	get_overlaps() yields it unless 'streaming' is False.
+	"""
 
 	stdout = termwrap.stdout()
 	stdout_indent1 = stdout.copy(
@@ -275,29 +478,45 @@ def handle_duplicates(sourceslist, apply_changes=None,
 	stdout_indent2 = stdout_indent1.copy(
 		initial_indent=stdout_indent1.subsequent_indent)
 
-	duplicates = tuple(get_duplicates(
-		sourceslist, equivalent_schemes=equivalent_schemes))
-	if duplicates:
-		for dupe_set in duplicates:
-			dupe_set = iter(
-				sort_dupe_set_by_scheme_class(equivalent_schemes, dupe_set))
-			orig = next(dupe_set)
-			for dupe in dupe_set:
-				stdout.print(_('Overlapping source entries:'))
-				for i, se in enumerate((orig, dupe), 1):
-					stdout_indent1.print(
-						_("{ordinal:2d}. file {file!r}:")
-							.format(ordinal=i, file=se.file))
-					stdout_indent2.print(se.line)
-				stdout.print(_("I disabled all but the first entry."), end="\n\n")
-				dupe.disabled = True
-
+	duplicates = get_overlaps(sourceslist,
+		equivalent_schemes=equivalent_schemes, streaming=streaming,
+		equivalent_hosts=equivalent_hosts)
+	if not streaming:
+		duplicates = tuple(duplicates)
+
+	# Group the reported entries by the entry that was kept.
+	disabled = {}
+	for _key, orig, dupe, _relation, _components, redundant in duplicates:
+		stdout.print(_('Overlapping source entries:'))
+		for i, se in enumerate((orig, dupe), 1):
+			stdout_indent1.print(
+				_("{ordinal:2d}. file {file!r}:")
+					.format(ordinal=i, file=se.file))
+			stdout_indent2.print(se.line)
+		if not redundant:
+			stdout.print(
+				_("I kept both entries because the second one belongs to a stanza "
+					"with other entries that aren't duplicates."),
+				end="\n\n")
+			continue
+		stdout.print(_("I disabled all but the first entry."), end="\n\n")
+		disabled_set = disabled.setdefault(id(orig), [orig])
+		if not dupe.disabled:
+			dupe.disabled = True
+			disabled_set.append(dupe)
+
+	# Each group holds the kept entry followed by the entries that were disabled
+	# in its favour.
+	disabled = [group for group in disabled.values() if len(group) > 1]
+	if disabled:
+		nduplicates = sum(len(group) - 1 for group in disabled)
 		stdout.print(
 			_N('{nduplicates:d} source entry was disabled',
 				'{nduplicates:d} source entries were disabled',
-				len(duplicates)).format(nduplicates=len(duplicates)) + ':')
+				nduplicates).format(nduplicates=nduplicates) + ':')
 		stdout_indent2.initial_indent = stdout_indent2.initial_indent[:-2]
-		stdout_indent2.print_all(map(str, itertools.chain(*duplicates)), sep='\n')
+		stdout_indent2.print_all(
+			map(str, itertools.chain.from_iterable(disabled)), sep='\n')
 
 		if apply_changes is None:
 			stdout.file.write('\n')
@@ -318,6 +537,233 @@ def handle_duplicates(sourceslist, apply_changes=None,
 	return 0
 
 
+def handle_roots(roots, equivalent_schemes=None, workers=None, chunksize=1,
+	equivalent_hosts=None
+):
+	"""Non-interactive report of duplicate entries and empty files
+
+	of the sources lists of multiple root file systems.
+	"""
+
+	from .fleet import scan_roots
+
+	stdout = termwrap.stdout()
+	stdout_indent1 = stdout.copy(
+		subsequent_indent=stdout.subsequent_indent + ' ' * 4)
+	stdout_indent1.initial_indent = stdout_indent1.subsequent_indent
+	stdout_indent2 = stdout_indent1.copy(
+		initial_indent=stdout_indent1.subsequent_indent + ' ' * 4,
+		subsequent_indent=stdout_indent1.subsequent_indent + ' ' * 4)
+	format_location = '{0:s}:{1:d}: {2:s}'.format
+
+	rv = 0
+	nduplicates = nempty = 0
+	for report in scan_roots(
+		roots, equivalent_schemes, workers, chunksize, equivalent_hosts
+	):
+		stdout.print(_("Root '{root:s}':").format(root=report.root))
+
+		for error in report.errors:
+			rv = 1
+			stdout_indent1.print('{:s}: {:s}'.format(_('Error'), error))
+
+		for orig, dupes in report.duplicates:
+			nduplicates += len(dupes)
+			stdout_indent1.print(_('Overlapping source entries:'))
+			stdout_indent2.print(format_location(*orig))
+			stdout_indent2.print_all(
+				(_('duplicate: {location:s}')
+					.format(location=format_location(*dupe))
+				for dupe in dupes),
+				sep='\n')
+
+		if report.empty_files:
+			nempty += len(report.empty_files)
+			stdout_indent1.print(
+				_('Files without valid and enabled repository lines:'))
+			stdout_indent2.print_all(report.empty_files, sep='\n')
+
+		if not (report.errors or report.duplicates or report.empty_files):
+			stdout_indent1.print(_('No duplicate entries were found.'))
+
+		stdout.file.write('\n')
+
+	stdout.print(
+		_('{nroots:d} root file systems scanned: {nduplicates:d} duplicate '
+			'entries and {nempty:d} empty sources list files found.')
+			.format(nroots=len(roots), nduplicates=nduplicates, nempty=nempty))
+
+	return rv
+
+
+def handle_records(sourceslist, format, apply_changes=None,
+	equivalent_schemes=None, streaming=True, policy=None, equivalent_hosts=None
+):
+	"""Non-interactive, machine-readable report of duplicate entries and empty
+	files
+
+	Duplicate entries are only disabled on disk if 'apply_changes' is true.
+	Files are only removed if 'apply_changes' is true and according to
+	'policy'.
+	"""
+
+	from .report import (
+		RecordWriter, iter_duplicate_records, iter_empty_file_records,
+		make_empty_file_record)
+
+	rv = 0
+	with RecordWriter(sys.stdout, format) as writer:
+		writer.write_all(iter_duplicate_records(sourceslist, equivalent_schemes,
+			streaming, 'disable' if apply_changes else 'none', equivalent_hosts))
+		if apply_changes:
+			sourceslist.save()
+
+		if policy is None or not apply_changes:
+			writer.write_all(iter_empty_file_records(sourceslist))
+		else:
+			rv, decisions = remove_empty_files_by_policy(sourceslist, policy)
+			writer.write_all(starmap(make_empty_file_record, decisions))
+
+	return rv
+
+
+def handle_diff(sourceslist, equivalent_schemes=None, streaming=True,
+	policy=None, equivalent_hosts=None
+):
+	"""Prints a unified diff of the planned changes without applying them
+
+	Only files with modified entries and removed files are read again. Removed
+	files include the '.save' companions that remove_sources_files() deletes.
+	File names are relative to the root directory (see diff module).
+	"""
+
+	from .report import iter_duplicate_records
+	from .diff import iter_edit_diff, iter_removal_diff, split_lines
+	from .util.itertools import last
+
+	last(iter_duplicate_records(sourceslist, equivalent_schemes, streaming,
+		equivalent_hosts=equivalent_hosts),
+		None)
+
+	empty_files = [
+		source_entries[0].file
+		for source_entries in get_empty_files(sourceslist)
+	]
+	if policy is not None:
+		empty_files = [
+			file for file, action in policy.decide(empty_files)
+			if action == 'remove'
+		]
+	removed = frozenset(empty_files)
+
+	def get_path(file):
+		return os.path.relpath(os.path.abspath(file), os.sep)
+
+	write = sys.stdout.write
+	for file, edits in sourceslist.get_edits().items():
+		if file not in removed:
+			with open(file, 'rb') as f:
+				foreach(write,
+					iter_edit_diff(get_path(file), split_lines(f.read()), edits))
+
+	for file in empty_files:
+		for removed_file in (file, file + '.save'):
+			try:
+				with open(removed_file, 'rb') as f:
+					lines = split_lines(f.read())
+			except FileNotFoundError:
+				continue
+			foreach(write, iter_removal_diff(get_path(removed_file), lines))
+
+	return 0
+
+
+def handle_watch(dirname=None, equivalent_schemes=None, format='text',
+	equivalent_hosts=None
+):
+	"""Reports changes to the sets of duplicates until interrupted
+
+	Only the changed files are parsed again; see watch.watch(). 'dirname'
+	replaces the default sources list directory. Only the 'text' and 'ndjson'
+	formats are supported.
+	"""
+
+	from .watch import watch, is_sources_file
+
+	if dirname is not None:
+		if not os.path.isdir(dirname):
+			termwrap.stderr().print(': '.join(
+				(_('Error'), _('No such directory'), dirname)))
+			return 1
+		files = []
+		dirs = (dirname,)
+	else:
+		from .sources import get_default_paths
+		file, dirname = get_default_paths()
+		files = [file]
+		dirs = (dirname,) if os.path.isdir(dirname) else ()
+
+	for dirname in dirs:
+		files.extend(
+			os.path.join(dirname, name) for name in sorted(os.listdir(dirname))
+			if is_sources_file(name))
+
+	if format == 'text':
+		on_change = _print_watch_changes
+	elif format == 'ndjson':
+		from .report import RecordWriter
+		on_change = fpartial(_write_watch_changes, RecordWriter(sys.stdout))
+	else:
+		termwrap.stderr().print('{:s}: {:s}'.format(_('Error'),
+			_("The watch mode doesn't support the format '{format:s}'.")
+				.format(format=format)))
+		return 1
+
+	watch(files, dirs, on_change, equivalent_schemes,
+		equivalent_hosts=equivalent_hosts)
+	return 0
+
+
+def _print_watch_changes(index, changes, errors):
+	stdout = termwrap.stdout()
+	stdout_indent1 = stdout.copy(
+		subsequent_indent=stdout.subsequent_indent + ' ' * 4)
+	stdout_indent2 = stdout_indent1.copy(
+		initial_indent=stdout_indent1.subsequent_indent)
+
+	for ex in errors:
+		termwrap.stderr().print('{:s}: {!s}'.format(_('Warning'), ex))
+
+	for key, dupe_set, _old_locations in changes:
+		if dupe_set is None:
+			stdout.print(
+				_("Source entries for '{key!s}' are no longer duplicated.")
+					.format(key=key),
+				end='\n\n')
+		else:
+			stdout.print(_('Overlapping source entries:'))
+			for i, se in enumerate(dupe_set, 1):
+				stdout_indent1.print(
+					_("{ordinal:2d}. file {file!r}:")
+						.format(ordinal=i, file=se.file))
+				stdout_indent2.print(se.line.strip())
+			stdout.file.write('\n')
+
+	stdout.file.flush()
+
+
+def _write_watch_changes(writer, index, changes, errors):
+	from .report import make_duplicates_record
+
+	for ex in errors:
+		writer.write({'kind': 'error', 'message': str(ex)})
+	for key, dupe_set, _old_locations in changes:
+		if dupe_set is None:
+			writer.write({'kind': 'resolved', 'key': str(key)})
+		else:
+			writer.write(make_duplicates_record(key, dupe_set[0], dupe_set[1:]))
+
+
 def sort_dupe_set_by_scheme_class(eqclasses, dupe_set):
 	if eqclasses and dupe_set:
 		schemes_class = eqclasses.get_class(dupe_set[0].parsed_uri.scheme)
@@ -326,8 +772,14 @@ def sort_dupe_set_by_scheme_class(eqclasses, dupe_set):
 	return dupe_set
 
 
-def handle_empty_files(sourceslist):
-	"""Interactive removal of sources list files without valid enabled entries"""
+def handle_empty_files(sourceslist, policy=None):
+	"""Interactive removal of sources list files without valid enabled entries
+
+	If there is a 'policy', it decides instead of the user.
+	"""
+
+	if policy is not None:
+		return handle_empty_files_by_policy(sourceslist, policy)
 
 	rv = 0
 	total_count = 0
@@ -372,6 +824,55 @@ def handle_empty_files(sourceslist):
 	return rv
 
 
+def handle_empty_files_by_policy(sourceslist, policy):
+	"""Non-interactive removal of sources list files without valid enabled
+	entries according to a policy.EmptyFilePolicy
+	"""
+
+	rv, decisions = remove_empty_files_by_policy(sourceslist, policy)
+	if decisions:
+		stdout = termwrap.stdout()
+		for file, action in decisions:
+			if action == 'keep':
+				stdout.print(
+					_("'{file:s}' contains no valid and enabled repository lines but "
+						"was kept according to the policy.").format(file=file))
+		stdout.file.write('\n')
+		stdout.print(
+			_('{nremoved:d} of {ntotal:d} empty sourcelist files removed.')
+				.format(
+					nremoved=sum(action == 'remove' for file, action in decisions),
+					ntotal=len(decisions)))
+
+	return rv
+
+
+def remove_empty_files_by_policy(sourceslist, policy):
+	"""Removes sources list files without valid enabled entries as one batch
+
+	after the policy decided on all of them. Returns a status code and a list
+	of pairs of each empty file and the action taken ('remove' or 'keep').
+	"""
+
+	empty_files = {
+		source_entries[0].file: source_entries
+		for source_entries in get_empty_files(sourceslist)
+	}
+	decisions = policy.decide(empty_files)
+
+	rv = 0
+	for i, (file, action) in enumerate(decisions):
+		if action == 'remove':
+			rv2, rc2 = remove_sources_files(file)
+			rv |= rv2
+			if rc2:
+				foreach(sourceslist.remove, empty_files[file])
+			else:
+				decisions[i] = (file, 'keep')
+
+	return rv, decisions
+
+
 if __name__ == '__main__':
 	try:
 		locale.setlocale(locale.LC_ALL, '')
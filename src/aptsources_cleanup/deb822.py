@@ -0,0 +1,220 @@
+# -*- coding: utf-8
+"""A streaming parser for sources list files in the deb822 format
+
+Each stanza of a '.sources' file is expanded into one source entry view for
+every combination of its types, URIs and suites as soon as the stanza ends.
+All entries of a stanza share its 'disabled' state which is written back to
+the file as an 'Enabled' field. Therefore a stanza is only disabled if all of
+its entries are duplicates (see get_overlaps()).
+"""
+
+__all__ = (
+	'Deb822Stanza', 'Deb822SourceEntryView', 'iter_deb822_source_entries',
+	'parse_deb822_source_entries')
+
+from .sources import SourceEntryView
+import itertools
+
+
+class Deb822Stanza:
+	"""The location and 'Enabled' state of a stanza of a deb822 sources file
+
+	'lineno' is the 1-based number of the first field line of the stanza and
+	'first_line' its content. 'enabled_lineno' is the line number of the
+	'Enabled' field or None if there is no such field.
+	"""
+
+	__slots__ = (
+		'file', 'lineno', 'first_line', 'enabled_lineno', 'disabled',
+		'disabled_orig')
+
+
+	def __init__(self, file, lineno, first_line, enabled_lineno=None,
+		disabled=False
+	):
+		self.file = file
+		self.lineno = lineno
+		self.first_line = first_line
+		self.enabled_lineno = enabled_lineno
+		self.disabled = disabled
+		self.disabled_orig = disabled
+
+
+	def is_modified(self):
+		return self.disabled != self.disabled_orig
+
+
+	def get_edit(self):
+		"""Returns the line number and the new content of the line that records
+		the 'disabled' state of this stanza.
+
+		An existing 'Enabled' field is replaced; otherwise the field is inserted
+		before the first line of the stanza.
+		"""
+
+		field = 'Enabled: {:s}\n'.format('no' if self.disabled else 'yes')
+		if self.enabled_lineno is not None:
+			return (self.enabled_lineno, field)
+		return (self.lineno, field + self.first_line)
+
+
+	def _mark_saved(self):
+		if self.is_modified():
+			if self.enabled_lineno is None:
+				self.first_line = self.get_edit()[1].partition('\n')[0] + '\n'
+				self.enabled_lineno = self.lineno
+			self.disabled_orig = self.disabled
+
+
+	def _shift_lines(self, offset):
+		self.lineno += offset
+		if self.enabled_lineno is not None:
+			self.enabled_lineno += offset
+
+
+	def __repr__(self):
+		return '<{:s}: {:s}:{:d}>'.format(
+			type(self).__qualname__, self.file, self.lineno)
+
+
+class Deb822SourceEntryView(SourceEntryView):
+	"""A view of a single source entry expanded from a deb822 stanza
+
+	'line' holds the equivalent entry in the one-line format. Disabling any
+	entry of a stanza disables all of them.
+	"""
+
+	__slots__ = ('stanza',)
+
+
+	def __init__(self, stanza, type, uri, dist, comps, options):
+		object.__setattr__(self, 'stanza', stanza)
+		super().__init__(type, uri, dist, comps, options, stanza.file,
+			stanza.lineno,
+			' '.join(itertools.chain(
+				(type,), ('[{:s}]'.format(' '.join(options)),) if options else (),
+				(uri, dist), comps)),
+			disabled=stanza.disabled)
+
+
+	@property
+	def disabled(self):
+		return self.stanza.disabled
+
+
+	@disabled.setter
+	def disabled(self, value):
+		self.stanza.disabled = value
+
+
+	@property
+	def origin(self):
+		return self.stanza
+
+
+	def is_modified(self):
+		return self.stanza.is_modified()
+
+
+	def get_edit(self):
+		return self.stanza.get_edit()
+
+
+	def _mark_saved(self):
+		self.stanza._mark_saved()
+
+
+	def str(self):
+		return '# ' + self.line if self.disabled else self.line
+
+
+def iter_deb822_source_entries(file):
+	"""Yields the source entries of a sources list file in the deb822 format
+
+	See parse_deb822_source_entries() for details.
+	"""
+
+	with open(file, encoding='utf-8', errors='surrogateescape', newline='') as f:
+		yield from parse_deb822_source_entries(f, file)
+
+
+def parse_deb822_source_entries(lines, file):
+	"""Yields the source entries of an iterable of lines in the deb822 format
+
+	Only the fields of the current stanza are kept in memory. Comment lines are
+	skipped. Stanzas without types, URIs or suites or with unknown types are
+	skipped like invalid lines of the one-line format. If there are no entries
+	at all, a single invalid entry for the first line is yielded so that the
+	file still shows up among the loaded entries.
+	"""
+
+	fields = {}
+	field = None
+	first_line = None
+	found = False
+
+	for lineno, line in enumerate(lines, 1):
+		if first_line is None:
+			first_line = line
+		if line.startswith('#'):
+			continue
+
+		if not line.strip():
+			if fields:
+				for se in _expand_stanza(fields, file):
+					found = True
+					yield se
+				fields = {}
+			field = None
+
+		elif line[0] in ' \t':
+			if field is not None:
+				field[0] += '\n' + line.strip()
+
+		else:
+			key, sep, value = line.partition(':')
+			if sep:
+				field = fields[key.strip().lower()] = [value.strip(), lineno, line]
+			else:
+				field = None
+
+	if fields:
+		for se in _expand_stanza(fields, file):
+			found = True
+			yield se
+
+	if not found and first_line is not None:
+		yield SourceEntryView('', '', '', (), (), file, 1, first_line,
+			invalid=True)
+
+
+def _expand_stanza(fields, file):
+	types, uris, suites, comps = (
+		fields[key][0].split() if key in fields else ()
+		for key in _entry_fields[:4])
+	if not (types and uris and suites) or not _source_types.issuperset(types):
+		return
+	if comps and any(suite.endswith('/') for suite in suites):
+		return
+
+	_, lineno, first_line = min(fields.values(), key=lambda field: field[1])
+	enabled = fields.get('enabled')
+	stanza = Deb822Stanza(file, lineno, first_line,
+		enabled and enabled[1],
+		enabled is not None and enabled[0].lower() in _false_values)
+
+	options = [
+		'{:s}={:s}'.format(key, ','.join(value.split()))
+		for key, (value, _, _) in fields.items()
+		if key not in _entry_fields and '\n' not in value
+	]
+
+	for type, uri, suite in itertools.product(types, uris, suites):
+		yield Deb822SourceEntryView(stanza, type, uri, suite, comps, options)
+
+
+_entry_fields = ('types', 'uris', 'suites', 'components', 'enabled')
+
+_source_types = frozenset(('deb', 'deb-src'))
+
+_false_values = frozenset(('no', 'false', 'off', '0', 'without', 'disable'))
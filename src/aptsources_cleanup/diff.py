@@ -0,0 +1,110 @@
+# -*- coding: utf-8
+"""Unified diffs of planned changes to sources list files
+
+The diffs are computed from the line edits of modified source entries (see
+sources.SourcesListView.get_edits()) and only for the affected files instead
+of comparing whole serialized files. File names in the headers are relative to
+a root directory and carry the prefixes 'a/' and 'b/' like those of git, so
+that 'patch -p1' applies the diff inside the root directory.
+"""
+
+__all__ = ('iter_edit_diff', 'iter_removal_diff', 'split_lines')
+
+
+def split_lines(data, encoding='utf-8'):
+	"""Splits bytes into a list of decoded lines at line feeds only
+
+	like the sources list parsers do. The lines keep their line breaks.
+	"""
+
+	return _split_text(str(data, encoding, 'surrogateescape'))
+
+
+def _split_text(text):
+	lines = text.split('\n')
+	last = lines.pop()
+	lines = [line + '\n' for line in lines]
+	if last:
+		lines.append(last)
+	return lines
+
+
+def iter_edit_diff(path, lines, edits, context=3):
+	"""Yields the lines of a unified diff of the edits to a file
+
+	'path' is the name of the file relative to the root directory of the diff.
+	'lines' is the current content of the file as returned by split_lines() and
+	'edits' maps 1-based line numbers to their new content which may span
+	multiple lines. Replaced lines keep their line break style like in
+	sources.splice_lines(). Edits that leave a line as it is are ignored.
+	"""
+
+	new_edits = {}
+	for lineno, line in edits.items():
+		old = lines[lineno - 1]
+		if old.endswith('\r\n'):
+			line = line.replace('\r\n', '\n').replace('\n', '\r\n')
+		if line != old:
+			new_edits[lineno] = _split_text(line)
+	edits = new_edits
+	if not edits:
+		return
+
+	yield '--- a/{:s}\n'.format(path)
+	yield '+++ b/{:s}\n'.format(path)
+
+	offset = 0
+	for hunk in _group_edits(sorted(edits), context):
+		start = max(hunk[0] - context, 1)
+		end = min(hunk[-1] + context, len(lines))
+		body = []
+		new_count = 0
+		for lineno in range(start, end + 1):
+			line = lines[lineno - 1]
+			new_lines = edits.get(lineno)
+			if new_lines is None:
+				body.append(' ' + line)
+				new_count += 1
+			else:
+				body.append('-' + line)
+				body.extend('+' + line for line in new_lines)
+				new_count += len(new_lines)
+
+		old_count = end - start + 1
+		yield '@@ -{:d},{:d} +{:d},{:d} @@\n'.format(
+			start, old_count, start + offset, new_count)
+		yield from map(_terminate_line, body)
+		offset += new_count - old_count
+
+
+def iter_removal_diff(path, lines):
+	"""Yields the lines of a unified diff of the removal of a file
+
+	'path' is the name of the file relative to the root directory of the diff.
+	"""
+
+	yield '--- a/{:s}\n'.format(path)
+	yield '+++ /dev/null\n'
+	if lines:
+		yield '@@ -1,{:d} +0,0 @@\n'.format(len(lines))
+		for line in lines:
+			yield _terminate_line('-' + line)
+
+
+def _group_edits(linenos, context):
+	"""Groups sorted line numbers whose hunks would overlap or touch"""
+
+	group = [linenos[0]]
+	for lineno in linenos[1:]:
+		if lineno - group[-1] > 2 * context + 1:
+			yield group
+			group = [lineno]
+		else:
+			group.append(lineno)
+	yield group
+
+
+def _terminate_line(line):
+	if line.endswith('\n'):
+		return line
+	return line + '\n\\ No newline at end of file\n'
@@ -0,0 +1,187 @@
+# -*- coding: utf-8
+"""Non-interactive scans of the sources list files of many root file systems
+
+Each root (e. g. a chroot or an unpacked container image) is scanned in a
+worker process and the results are returned as plain, picklable RootReport
+records so that they can be aggregated into a single report.
+"""
+
+__all__ = ('RootReport', 'scan_root', 'scan_roots', 'read_roots')
+
+from . import get_overlaps, get_empty_files
+from .sources import SourcesListView, read_source_entries
+from .util.relations import EquivalenceRelation
+from .util.functools import partial as fpartial
+from collections import namedtuple
+import os.path
+import errno
+import itertools
+
+
+class RootReport(namedtuple('RootReportBase',
+	('root', 'duplicates', 'empty_files', 'errors'))
+):
+	"""The findings of a scan of a single root file system
+
+	'duplicates' is a tuple of pairs of the location of a kept source entry and
+	a tuple of the locations of the entries that duplicate it and may be
+	disabled (see get_overlaps()). A location is a tuple of a file name, a line
+	number and the entry line. 'empty_files' holds the names of files without
+	valid enabled entries and 'errors' the messages of errors that occurred
+	while reading files.
+	"""
+
+	__slots__ = ()
+
+
+def get_sources_files(root, errors):
+	"""Returns the sources list files below a root directory in a stable order
+
+	Symbolic links are resolved inside the root directory (see
+	resolve_in_root()) so that links in an image never lead to files of the
+	host, and each file is returned once. The messages of errors other than a
+	missing parts directory are appended to 'errors'.
+	"""
+
+	partsdir = 'etc/apt/sources.list.d'
+	try:
+		names = sorted(
+			file for file in os.listdir(resolve_in_root(root, partsdir))
+			if file.endswith(('.list', '.sources')))
+	except FileNotFoundError:
+		names = ()
+	except OSError as ex:
+		errors.append(str(ex))
+		names = ()
+
+	files = {}
+	for path in itertools.chain(
+		('etc/apt/sources.list',), (partsdir + '/' + name for name in names)
+	):
+		try:
+			file = resolve_in_root(root, path)
+		except OSError as ex:
+			errors.append(str(ex))
+		else:
+			if file not in files and os.path.isfile(file):
+				files[file] = None
+	return list(files)
+
+
+MAX_SYMLINKS = 40
+
+
+def resolve_in_root(root, path):
+	"""Resolves the symbolic links in a path below a root directory like a chroot
+
+	'path' is relative to 'root'. The targets of absolute links are relative to
+	'root' too and '..' never leads above it. Components that aren't symbolic
+	links or can't be inspected are kept as they are. Raises OSError after more
+	than MAX_SYMLINKS links.
+	"""
+
+	pending = path.split('/')
+	pending.reverse()
+	resolved = []
+	nlinks = 0
+
+	while pending:
+		component = pending.pop()
+		if component in ('', '.'):
+			continue
+		if component == '..':
+			if resolved:
+				resolved.pop()
+			continue
+
+		try:
+			target = os.readlink(os.path.join(root, *resolved, component))
+		except OSError:
+			resolved.append(component)
+			continue
+
+		nlinks += 1
+		if nlinks > MAX_SYMLINKS:
+			raise OSError(errno.ELOOP, os.strerror(errno.ELOOP),
+				os.path.join(root, path))
+		if target.startswith('/'):
+			resolved.clear()
+		target = target.split('/')
+		target.reverse()
+		pending.extend(target)
+
+	return os.path.join(root, *resolved)
+
+
+def scan_root(root, equivalent_schemes=EquivalenceRelation.EMPTY,
+	equivalent_hosts=None
+):
+	"""Scans the sources list files of a root directory and returns a RootReport"""
+
+	if equivalent_schemes is None:
+		equivalent_schemes = EquivalenceRelation.EMPTY
+	if not os.path.isdir(root):
+		return RootReport(root, (), (), (
+			'{:s}: {:s}'.format(os.strerror(errno.ENOENT), root),))
+
+	sourceslist = SourcesListView()
+	errors = []
+	for file in get_sources_files(root, errors):
+		entries = read_source_entries(file)
+		if isinstance(entries, EnvironmentError):
+			errors.append(str(entries))
+		else:
+			sourceslist.list.extend(entries)
+
+	# Duplicates of a deb822 stanza with other entries that aren't duplicates
+	# remain enabled and aren't reported.
+	duplicates = {}
+	for overlap in get_overlaps(sourceslist, equivalent_schemes,
+		equivalent_hosts=equivalent_hosts
+	):
+		if overlap.redundant:
+			dupes = duplicates.setdefault(id(overlap.first), (overlap.first, []))[1]
+			dupes.append(overlap.second)
+
+	return RootReport(root,
+		tuple(
+			(_get_location(orig), tuple(map(_get_location, dupes)))
+			for orig, dupes in duplicates.values()),
+		tuple(entries[0].file for entries in get_empty_files(sourceslist)),
+		tuple(errors))
+
+
+def _get_location(se):
+	return (se.file, se.lineno, se.line.strip())
+
+
+def scan_roots(roots, equivalent_schemes=None, workers=None, chunksize=1,
+	equivalent_hosts=None
+):
+	"""Yields a RootReport for each root directory in the order of 'roots'
+
+	The roots are scanned in a pool of 'workers' processes (or as many as
+	there are CPUs if None) that receive 'chunksize' roots at a time. A single
+	worker scans all roots in the current process.
+	"""
+
+	scan = fpartial(scan_root, equivalent_schemes=equivalent_schemes,
+		equivalent_hosts=equivalent_hosts)
+	if workers == 1:
+		yield from map(scan, roots)
+	else:
+		from concurrent.futures import ProcessPoolExecutor
+		with ProcessPoolExecutor(workers) as executor:
+			yield from executor.map(scan, roots, chunksize=chunksize)
+
+
+def read_roots(file):
+	"""Yields the root directories listed in a text file
+
+	one per line; blank lines and lines starting with '#' are skipped.
+	"""
+
+	for line in file:
+		line = line.strip()
+		if line and not line.startswith('#'):
+			yield line
@@ -0,0 +1,202 @@
+# -*- coding: utf-8
+"""Rules that decide whether to remove empty sources list files
+
+A policy file holds one rule per line. Each rule starts with an action,
+'remove' or 'keep', followed by conditions that must all hold for the rule
+to apply to a file:
+
+  path=GLOB      The path of the file matches a shell-style pattern. Patterns
+                 without a slash are matched against the file name only.
+                 May be repeated; one matching pattern suffices.
+  owner=OWNER    The file belongs to the Debian package OWNER according to the
+                 dpkg database. 'any' and 'none' match files that belong to
+                 some and no package respectively.
+  min-age=AGE    The file was last modified at least AGE ago.
+  max-age=AGE    The file was last modified at most AGE ago.
+
+AGE is a number optionally followed by one of the units 's', 'm', 'h', 'd'
+and 'w'; the default unit is days. Blank lines and lines starting with '#'
+are ignored. The first rule that applies decides; files without an
+applicable rule are kept. Example:
+
+  keep   owner=any
+  remove path=*.list min-age=30d
+"""
+
+__all__ = ('EmptyFilePolicy', 'PolicyRule', 'get_package_owners', 'parse_age')
+
+from collections import namedtuple
+from fnmatch import fnmatchcase
+import os.path
+import glob
+import time
+import re
+
+
+class PolicyRule(namedtuple('PolicyRuleBase',
+	('action', 'paths', 'owner', 'min_age', 'max_age', 'lineno'))
+):
+	"""A single rule of an EmptyFilePolicy; see the module documentation"""
+
+	__slots__ = ()
+
+	ACTIONS = ('remove', 'keep')
+
+
+	@classmethod
+	def parse(cls, line, lineno=None):
+		"""Parses a rule from a line of a policy file; raises ValueError."""
+
+		action, *conditions = line.split()
+		if action not in cls.ACTIONS:
+			raise ValueError('Unknown action: ' + action)
+
+		paths = []
+		owner = min_age = max_age = None
+		for condition in conditions:
+			key, sep, value = condition.partition('=')
+			if not (sep and value):
+				raise ValueError('Invalid condition: ' + condition)
+			if key == 'path':
+				paths.append(value)
+			elif key == 'owner':
+				owner = value
+			elif key == 'min-age':
+				min_age = parse_age(value)
+			elif key == 'max-age':
+				max_age = parse_age(value)
+			else:
+				raise ValueError('Unknown condition: ' + key)
+
+		return cls(action, tuple(paths), owner, min_age, max_age, lineno)
+
+
+	def applies(self, file, owners=None, now=None):
+		"""Tests whether this rule applies to a file
+
+		'owners' maps absolute paths to sets of package names (see
+		get_package_owners()); it is only needed for rules with an 'owner'
+		condition.
+		"""
+
+		if self.paths and not any(
+			fnmatchcase(file if '/' in pattern else os.path.basename(file), pattern)
+			for pattern in self.paths
+		):
+			return False
+
+		if self.owner is not None:
+			packages = owners.get(os.path.abspath(file), ())
+			if self.owner == 'any':
+				if not packages:
+					return False
+			elif self.owner == 'none':
+				if packages:
+					return False
+			elif self.owner not in packages:
+				return False
+
+		if self.min_age is not None or self.max_age is not None:
+			try:
+				age = (time.time() if now is None else now) - os.stat(file).st_mtime
+			except EnvironmentError:
+				return False
+			if self.min_age is not None and age < self.min_age:
+				return False
+			if self.max_age is not None and age > self.max_age:
+				return False
+
+		return True
+
+
+_age_pattern = re.compile(r'(\d+(?:\.\d*)?)([smhdw]?)')
+
+_age_units = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60,
+	'w': 7 * 24 * 60 * 60, '': 24 * 60 * 60}
+
+
+def parse_age(s):
+	"""Parses an age like '30d' into seconds."""
+
+	m = _age_pattern.fullmatch(s)
+	if m is None:
+		raise ValueError('Invalid age: ' + s)
+	return float(m.group(1)) * _age_units[m.group(2)]
+
+
+class EmptyFilePolicy:
+	"""An ordered sequence of PolicyRule objects"""
+
+	__slots__ = ('rules', 'dpkg_dir')
+
+
+	def __init__(self, rules, dpkg_dir='/var/lib/dpkg'):
+		self.rules = tuple(rules)
+		self.dpkg_dir = dpkg_dir
+
+
+	@classmethod
+	def parse(cls, lines, filename='<policy>', **kwargs):
+		"""Parses policy rules from an iterable of lines
+
+		Raises ValueError with the file name and line number of invalid rules.
+		"""
+
+		rules = []
+		for lineno, line in enumerate(lines, 1):
+			line = line.strip()
+			if line and not line.startswith('#'):
+				try:
+					rules.append(PolicyRule.parse(line, lineno))
+				except ValueError as ex:
+					raise ValueError('{:s}:{:d}: {!s}'.format(filename, lineno, ex))
+		return cls(rules, **kwargs)
+
+
+	@classmethod
+	def load(cls, path, **kwargs):
+		with open(path) as f:
+			return cls.parse(f, path, **kwargs)
+
+
+	def decide(self, files):
+		"""Returns a list of pairs of each file and the action for it
+
+		The dpkg database is read at most once for all files.
+		"""
+
+		files = tuple(files)
+		owners = None
+		if any(rule.owner is not None for rule in self.rules):
+			owners = get_package_owners(map(os.path.abspath, files), self.dpkg_dir)
+		now = time.time()
+
+		return [
+			(file, next(
+				(rule.action for rule in self.rules
+					if rule.applies(file, owners, now)),
+				'keep'))
+			for file in files
+		]
+
+
+def get_package_owners(paths, dpkg_dir='/var/lib/dpkg'):
+	"""Returns a dictionary of those paths owned by packages to the set of their
+	owners' names
+
+	according to the file lists of the dpkg database.
+	"""
+
+	paths = frozenset(paths)
+	owners = {}
+	for list_file in glob.iglob(os.path.join(dpkg_dir, 'info', '*.list')):
+		package = os.path.basename(list_file)[:-len('.list')].partition(':')[0]
+		try:
+			with open(list_file, encoding='utf-8', errors='surrogateescape') as f:
+				for path in f:
+					path = path.rstrip('\n')
+					if path in paths:
+						owners.setdefault(path, set()).add(package)
+		except EnvironmentError:
+			pass
+	return owners
@@ -0,0 +1,125 @@
+# -*- coding: utf-8
+"""Machine-readable reports of duplicate entries and empty sources list files
+
+Records are plain dictionaries that are written as soon as they are produced,
+either as a JSON array or as newline-delimited JSON (one object per line).
+Nothing in here uses the terminal, text wrapping or translation utilities.
+"""
+
+__all__ = (
+	'RecordWriter', 'FORMATS', 'iter_duplicate_records',
+	'iter_empty_file_records', 'make_duplicates_record', 'make_overlap_record',
+	'make_empty_file_record')
+
+from . import get_overlaps, get_empty_files
+import json
+
+
+FORMATS = ('json', 'ndjson')
+
+
+class RecordWriter:
+	"""Writes records to a text file object in the format 'json' or 'ndjson'
+
+	Use it as a context manager or call close() to terminate a JSON array.
+	"""
+
+	__slots__ = ('file', 'format', '_count')
+
+
+	def __init__(self, file, format='ndjson'):
+		if format not in FORMATS:
+			raise ValueError('Unsupported record format: ' + repr(format))
+		self.file = file
+		self.format = format
+		self._count = 0
+
+
+	def write(self, record):
+		if self.format == 'ndjson':
+			prefix = ''
+		else:
+			prefix = ',\n' if self._count else '[\n'
+		self.file.write(prefix + json.dumps(record, sort_keys=True))
+		if self.format == 'ndjson':
+			self.file.write('\n')
+			self.file.flush()
+		self._count += 1
+
+
+	def write_all(self, records):
+		for record in records:
+			self.write(record)
+
+
+	def close(self):
+		if self.format == 'json':
+			self.file.write('\n]\n' if self._count else '[]\n')
+			self._count = 0
+		self.file.flush()
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+
+def iter_duplicate_records(sourceslist, equivalent_schemes=None,
+	streaming=True, action='disable', equivalent_hosts=None
+):
+	"""Yields a record for each pair of overlapping source entries
+
+	and disables the second entry of each pair like the interactive mode does.
+	Each record holds the shared component-less key, the relation and shared
+	components of both entries, the kept entry and the other entry with
+	'action'. Duplicates that belong to a deb822 stanza with other entries that
+	aren't duplicates remain enabled and are reported with the action 'none'
+	(see get_overlaps()).
+	"""
+
+	for overlap in get_overlaps(sourceslist, equivalent_schemes,
+		streaming=streaming, equivalent_hosts=equivalent_hosts
+	):
+		if overlap.redundant:
+			overlap.second.disabled = True
+		yield make_overlap_record(
+			overlap, action if overlap.redundant else 'none')
+
+
+def make_duplicates_record(key, orig, dupes, action='none'):
+	return {
+		'kind': 'duplicates',
+		'key': str(key),
+		'keeper': _get_entry_record(orig),
+		'duplicates': [
+			dict(_get_entry_record(dupe), action=action) for dupe in dupes],
+	}
+
+
+def make_overlap_record(overlap, action='none'):
+	return {
+		'kind': 'overlap',
+		'key': str(overlap.key),
+		'relation': overlap.relation,
+		'components': list(overlap.components),
+		'keeper': _get_entry_record(overlap.first),
+		'duplicate': dict(_get_entry_record(overlap.second), action=action),
+	}
+
+
+def iter_empty_file_records(sourceslist, action='none'):
+	"""Yields a record for each sources list file without valid enabled entries"""
+
+	for source_entries in get_empty_files(sourceslist):
+		yield make_empty_file_record(source_entries[0].file, action)
+
+
+def make_empty_file_record(file, action='none'):
+	return {'kind': 'empty_file', 'file': file, 'action': action}
+
+
+def _get_entry_record(se):
+	return {'file': se.file, 'line': se.lineno, 'entry': se.line.strip()}
@@ -0,0 +1,200 @@
+# -*- coding: utf-8
+"""A persistent cache of parsed sources list files
+
+Each cached file is identified by its device, inode, size and modification
+time and optionally by a hash of its content. The cache is stored in the
+'marshal' format which only holds tuples, strings and numbers.
+"""
+
+__all__ = ('ScanCache', 'get_default_path')
+
+from .sources import SourceEntryView
+from .deb822 import Deb822Stanza, Deb822SourceEntryView
+from .util.gettext import _
+from .util.terminal import termwrap
+import os
+import sys
+import time
+import errno
+import marshal
+
+
+def get_default_path():
+	"""Returns the default scan cache location below the user's cache directory."""
+
+	return os.path.join(
+		os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+		'aptsources-cleanup', 'scan-cache')
+
+
+class ScanCache:
+	"""Maps sources list files to the records of their parsed source entries
+
+	A cached file is reparsed if its 'os.stat()' key or, if 'hash_content' is
+	true, its content hash changed since it was cached. On save() entries of
+	files that weren't looked up and have changed or vanished are evicted.
+	Files modified less than RACY_INTERVAL seconds before they were parsed
+	aren't cached because a subsequent change may leave their key unchanged.
+	"""
+
+	__slots__ = ('path', 'hash_content', 'files', '_used', '_modified')
+
+	MAGIC = b'aptsources-cleanup scan cache\n'
+
+	FORMAT = (1, marshal.version, sys.version_info[:2])
+
+	RACY_INTERVAL = 2
+
+
+	def __init__(self, path, hash_content=False, files=None):
+		self.path = path
+		self.hash_content = hash_content
+		self.files = {} if files is None else files
+		self._used = set()
+		self._modified = False
+
+
+	@classmethod
+	def load(cls, path, hash_content=False):
+		"""Reads a scan cache from a file
+
+		A missing, unreadable or incompatible cache file yields an empty cache.
+		"""
+
+		files = None
+		try:
+			with open(path, 'rb') as f:
+				if f.read(len(cls.MAGIC)) == cls.MAGIC:
+					# Much faster than marshal.load() on the file object
+					format, files = marshal.loads(f.read())
+					if format != cls.FORMAT or not isinstance(files, dict):
+						files = None
+		except (ValueError, EOFError, TypeError):
+			pass
+		except EnvironmentError as ex:
+			if ex.errno != errno.ENOENT:
+				termwrap.stderr().print('{:s}: {!s}'.format(_('Warning'), ex))
+
+		return cls(path, hash_content, files)
+
+
+	def get_source_entries(self, file, parse):
+		"""Returns the list of source entries of a file
+
+		from the cache if possible or from 'parse(file)' otherwise.
+		"""
+
+		st = os.stat(file)
+		key = _get_stat_key(st)
+		digest = self._get_digest(file) if self.hash_content else None
+		self._used.add(file)
+
+		cached = self.files.get(file)
+		if (cached is not None and cached[0] == key and
+			(digest is None or cached[1] == digest)
+		):
+			return _decode_entries(file, cached[2])
+
+		entries = parse(file)
+		if time.time() - st.st_mtime >= self.RACY_INTERVAL:
+			self.files[file] = (key, digest, _encode_entries(entries))
+			self._modified = True
+		elif self.files.pop(file, None) is not None:
+			self._modified = True
+		return entries
+
+
+	def save(self):
+		"""Writes the cache back to its file if it changed
+
+		through the current run or the eviction of obsolete entries.
+		"""
+
+		for file in tuple(self.files.keys() - self._used):
+			try:
+				valid = _get_stat_key(os.stat(file)) == self.files[file][0]
+			except EnvironmentError:
+				valid = False
+			if not valid:
+				del self.files[file]
+				self._modified = True
+
+		if not self._modified:
+			return
+
+		import tempfile
+
+		dirname = os.path.dirname(self.path) or os.curdir
+		try:
+			os.makedirs(dirname, exist_ok=True)
+			with tempfile.NamedTemporaryFile(
+				dir=dirname, prefix='.scan-cache.', delete=False
+			) as f:
+				try:
+					f.write(self.MAGIC)
+					f.write(marshal.dumps((self.FORMAT, self.files)))
+				except BaseException:
+					os.remove(f.name)
+					raise
+			os.replace(f.name, self.path)
+		except EnvironmentError as ex:
+			termwrap.stderr().print('{:s}: {!s}'.format(_('Warning'), ex))
+		else:
+			self._modified = False
+
+
+	@staticmethod
+	def _get_digest(file):
+		import hashlib
+
+		with open(file, 'rb') as f:
+			return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+
+def _get_stat_key(st):
+	return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+# Record types
+_ONE_LINE_ENTRY = 0
+_DEB822_STANZA = 1
+
+
+def _encode_entries(entries):
+	"""Turns a list of source entry views into a tuple of marshallable records
+
+	The entries of a deb822 stanza are combined into one record.
+	"""
+
+	records = []
+	stanzas = {}
+	for se in entries:
+		if isinstance(se, Deb822SourceEntryView):
+			stanza_entries = stanzas.get(id(se.stanza))
+			if stanza_entries is None:
+				stanza = se.stanza
+				stanza_entries = stanzas[id(stanza)] = []
+				records.append((_DEB822_STANZA, stanza.lineno, stanza.first_line,
+					stanza.enabled_lineno, stanza.disabled_orig, stanza_entries))
+			stanza_entries.append((se.type, se.uri, se.dist, se.comps, se.options))
+		else:
+			records.append((_ONE_LINE_ENTRY, se.type, se.uri, se.dist, se.comps,
+				se.options, se.lineno, se.line, se.invalid, se.disabled))
+
+	return tuple(
+		record[:-1] + (tuple(record[-1]),)
+			if record[0] == _DEB822_STANZA else record
+		for record in records)
+
+
+def _decode_entries(file, records):
+	entries = []
+	for record in records:
+		if record[0] == _DEB822_STANZA:
+			_, lineno, first_line, enabled_lineno, disabled, stanza_entries = record
+			stanza = Deb822Stanza(file, lineno, first_line, enabled_lineno, disabled)
+			entries.extend(
+				Deb822SourceEntryView(stanza, *fields) for fields in stanza_entries)
+		else:
+			entries.append(SourceEntryView(*record[1:6], file, *record[6:]))
+	return entries
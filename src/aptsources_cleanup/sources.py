@@ -0,0 +1,482 @@
+# -*- coding: utf-8
+"""Compact, mostly read-only representations of Apt sources list entries
+
+They hold only the data needed to detect duplicate entries and empty sources
+list files. Modified entries are written back by toggling the '#' in front of
+their lines without the help of aptsources.sourceslist.SourceEntry.
+
+This module also contains a parser for the one-line sources list format that
+doesn't depend on the 'aptsources' module. Files in the deb822 format are
+handled by the 'deb822' module.
+"""
+
+__all__ = (
+	'SourceEntryView', 'SourcesListView', 'iter_source_entries',
+	'parse_source_entries', 'read_source_entries', 'splice_lines',
+	'get_default_paths')
+
+from .util.gettext import _
+from .util.terminal import termwrap
+from .util.functools import comp, partial as fpartial
+from .util.fileutils import AtomicWriteBatch
+from .util.collections import ExtSet
+from .util.operator import methodcaller
+import re
+import mmap
+import os.path
+from sys import intern
+
+
+class SourceEntryView:
+	"""A compact, read-only view of a single line of a sources list file
+
+	It offers the same attributes as aptsources.sourceslist.SourceEntry that
+	are needed for duplicate detection, plus 'options' (a tuple of
+	'key=value' strings) and 'lineno' (the 1-based line number inside 'file').
+	The field strings are interned since they repeat across many entries.
+	Only 'disabled' and the cache attribute 'parsed_uri' may be changed after
+	construction.
+	"""
+
+	__slots__ = (
+		'type', 'uri', 'dist', 'comps', 'options', 'file', 'lineno', 'line',
+		'invalid', 'disabled', 'parsed_uri')
+
+	_mutable_attributes = frozenset(('disabled', 'parsed_uri'))
+
+
+	def __init__(self, type, uri, dist, comps, options, file, lineno, line,
+		invalid=False, disabled=False
+	):
+		init = object.__setattr__
+		init(self, 'type', intern(type))
+		init(self, 'uri', intern(uri))
+		init(self, 'dist', intern(dist))
+		init(self, 'comps', tuple(map(intern, comps)))
+		init(self, 'options', tuple(map(intern, options)))
+		init(self, 'file', file)
+		init(self, 'lineno', lineno)
+		init(self, 'line', line)
+		init(self, 'invalid', invalid)
+		init(self, 'disabled', disabled)
+
+
+	def __setattr__(self, name, value):
+		if name not in self._mutable_attributes:
+			raise AttributeError(
+				"'{:s}' object attribute '{:s}' is read-only"
+					.format(type(self).__qualname__, name))
+		super().__setattr__(name, value)
+
+
+	@classmethod
+	def from_source_entry(cls, se, lineno):
+		"""Creates a view of an aptsources.sourceslist.SourceEntry object"""
+
+		options = []
+		if se.architectures:
+			options.append('arch=' + ','.join(se.architectures))
+		if se.trusted is not None:
+			options.append('trusted=' + ('yes' if se.trusted else 'no'))
+
+		return cls(se.type, se.uri, se.dist, se.comps, options, se.file, lineno,
+			se.line, se.invalid, se.disabled)
+
+
+	@property
+	def origin(self):
+		"""The object whose 'disabled' state this entry shares, i. e. itself"""
+		return self
+
+
+	def is_modified(self):
+		"""Tests whether the 'disabled' flag differs from the original line."""
+		return (not self.invalid and
+			self.disabled != self.line.lstrip().startswith('#'))
+
+
+	def get_edit(self):
+		"""Returns the line number and the new content of the line to modify."""
+		return (self.lineno, self.str())
+
+
+	def _mark_saved(self):
+		object.__setattr__(self, 'line', self.str())
+
+
+	def _shift_lines(self, offset):
+		object.__setattr__(self, 'lineno', self.lineno + offset)
+
+
+	def str(self):
+		"""Returns the (modified) line as it would be written to 'file'.
+
+		Only the leading '#' is added or removed, everything else remains as is.
+		"""
+
+		if not self.is_modified():
+			return self.line
+		if self.disabled:
+			return '# ' + self.line
+		return _disabled_prefix_pattern.sub(r'\1', self.line, 1)
+
+
+	def __str__(self):
+		return self.str().strip()
+
+
+	def __repr__(self):
+		return '<{:s}: {:s}:{:d}: {!r}>'.format(
+			type(self).__qualname__, self.file, self.lineno, str(self))
+
+
+class SourcesListView:
+	"""A light-weight stand-in for aptsources.sourceslist.SourcesList
+
+	Its entries are SourceEntryView objects. Unlike SourcesList it doesn't load
+	the default sources list files on construction and it only writes files
+	with modified entries.
+	"""
+
+	__slots__ = ('list',)
+
+
+	def __init__(self):
+		self.list = []
+
+
+	def __iter__(self):
+		return iter(self.list)
+
+
+	def refresh(self, jobs=1, cache=None):
+		"""Loads the default sources list files according to the Apt
+		configuration.
+
+		See load_all() for 'jobs' and 'cache'.
+		"""
+
+		self.list.clear()
+		files = []
+		file, partsdir = get_default_paths()
+		if os.path.exists(file):
+			files.append(file)
+		if os.path.exists(partsdir):
+			files.extend(
+				os.path.join(partsdir, file) for file in os.listdir(partsdir)
+				if file.endswith(('.list', '.sources')))
+		self.load_all(files, jobs, cache)
+
+
+	def load(self, file):
+		"""Appends the source entries of a sources list file to this list.
+
+		Files ending in '.sources' are parsed in the deb822 format, all others in
+		the one-line format. See iter_source_entries() and
+		deb822.iter_deb822_source_entries() for details.
+		"""
+
+		self.load_all((file,))
+
+
+	def load_all(self, files, jobs=1, cache=None):
+		"""Appends the source entries of multiple sources list files to this list
+
+		in the order of 'files'. If 'jobs' is greater than 1, up to that many
+		files are read and parsed concurrently in a thread pool which pays off
+		when the time is spent waiting for the file system. The result is the
+		same either way. Unchanged files found in the scancache.ScanCache object
+		'cache' aren't parsed again.
+		"""
+
+		read = fpartial(read_source_entries, cache=cache)
+		if jobs > 1:
+			from concurrent.futures import ThreadPoolExecutor
+			with ThreadPoolExecutor(jobs) as executor:
+				self._extend_all(executor.map(read, files))
+		else:
+			self._extend_all(map(read, files))
+
+
+	def _extend_all(self, results):
+		for entries in results:
+			if isinstance(entries, EnvironmentError):
+				termwrap.stderr().print('{:s}: {!s}'.format(_('Warning'), entries))
+			else:
+				self.list.extend(entries)
+
+
+	def load_aptsources(self, file):
+		"""Appends all lines of a sources list file to this list
+
+		using the parser of the 'aptsources' module.
+		"""
+
+		from . import aptsources
+		SourceEntry = aptsources.sourceslist.SourceEntry
+
+		try:
+			with open(file) as f:
+				self.list.extend(
+					SourceEntryView.from_source_entry(SourceEntry(line, file), lineno)
+					for lineno, line in enumerate(f, 1))
+		except EnvironmentError as ex:
+			termwrap.stderr().print('{:s}: {!s}'.format(_('Warning'), ex))
+
+
+	def remove(self, source_entry):
+		self.list.remove(source_entry)
+
+
+	def save(self, sync=True):
+		"""Writes all sources list files with modified entries back to disk.
+
+		Only the lines of modified entries are replaced; all other bytes of a file
+		remain the same and files without modified entries aren't touched at all.
+		The files are replaced atomically as one util.fileutils.AtomicWriteBatch.
+		Afterwards the entries are unmodified with respect to the new files.
+		"""
+
+		modified = [se for se in self.list if se.is_modified()]
+		edits = self.get_edits(modified)
+
+		with AtomicWriteBatch(sync) as batch:
+			for file, lines in edits.items():
+				with open(file, 'rb') as f:
+					data = splice_lines(f.read(), lines)
+				if data is not None:
+					batch.write(file, data)
+
+		self._shift_lines(edits)
+		for se in modified:
+			se._mark_saved()
+
+
+	def get_edits(self, modified=None):
+		"""Returns the line edits of modified entries
+
+		as a dictionary of files to dictionaries of 1-based line numbers to the
+		new line content. 'modified' defaults to all modified entries.
+		"""
+
+		if modified is None:
+			modified = filter(methodcaller('is_modified'), self.list)
+		edits = {}
+		for se in modified:
+			lineno, line = se.get_edit()
+			edits.setdefault(se.file, {})[lineno] = line
+		return edits
+
+
+	def _shift_lines(self, edits):
+		"""Adjusts the line numbers of entries that follow inserted lines."""
+
+		inserted = {}
+		for file, lines in edits.items():
+			inserted_lines = [
+				(lineno, line.count('\n') - 1) for lineno, line in lines.items()
+				if line.count('\n') > 1
+			]
+			if inserted_lines:
+				inserted[file] = inserted_lines
+
+		if inserted:
+			shifted_origins = ExtSet()
+			for se in self.list:
+				offset = sum(
+					count for lineno, count in inserted.get(se.file, ())
+					if lineno < se.lineno)
+				if offset:
+					se._shift_lines(offset)
+					origin = se.origin
+					if origin is not se and shifted_origins.add(id(origin)):
+						origin._shift_lines(offset)
+
+
+def splice_lines(data, lines, encoding='utf-8'):
+	"""Replaces lines of a bytes object
+
+	'lines' maps 1-based line numbers to their new content as strings. A
+	replaced line keeps its original line break style. Returns the new bytes
+	object or None if the replacements didn't change anything.
+	"""
+
+	parts = []
+	start = 0
+	lineno = 1
+	copied = 0
+
+	for target in sorted(lines):
+		while lineno < target:
+			start = data.find(b'\n', start) + 1
+			if not start:
+				raise ValueError(
+					'Line {:d} is past the end of the data'.format(target))
+			lineno += 1
+
+		end = data.find(b'\n', start) + 1 or len(data)
+		old = data[start:end]
+		line = lines[target]
+		if old.endswith(b'\r\n'):
+			line = line.replace('\r\n', '\n').replace('\n', '\r\n')
+		new = line.encode(encoding, 'surrogateescape')
+		if new != old:
+			parts += (data[copied:start], new)
+			copied = end
+
+	if not parts:
+		return None
+	parts.append(data[copied:])
+	return b''.join(parts)
+
+
+def get_default_paths():
+	"""Returns the path of the main sources list file and of the directory of
+	additional sources list files according to the Apt configuration.
+	"""
+
+	from . import aptsources
+	apt_pkg = aptsources.sourceslist.apt_pkg
+	return (
+		apt_pkg.config.find_file('Dir::Etc::sourcelist'),
+		apt_pkg.config.find_dir('Dir::Etc::sourceparts'))
+
+
+def read_source_entries(file, cache=None):
+	"""Returns a list of the source entries of a sources list file
+
+	or the EnvironmentError that occurred while reading it.
+	"""
+
+	if file.endswith('.sources'):
+		from .deb822 import iter_deb822_source_entries as iter_entries
+	else:
+		iter_entries = iter_source_entries
+	parse = comp(iter_entries, list)
+
+	try:
+		if cache is not None:
+			return cache.get_source_entries(file, parse)
+		return parse(file)
+	except EnvironmentError as ex:
+		return ex
+
+
+def iter_source_entries(file):
+	"""Yields the source entries of a sources list file in the one-line format
+
+	The file content is passed to parse_source_entries(). Files of at least
+	MMAP_THRESHOLD bytes are memory-mapped instead of read.
+	"""
+
+	with open(file, 'rb') as f:
+		if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+			yield from parse_source_entries(f.read(), file)
+		else:
+			with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+				yield from parse_source_entries(buf, file)
+
+
+# Mapping small files costs more than reading them.
+MMAP_THRESHOLD = 64 << 10
+
+
+def parse_source_entries(buf, file, encoding='utf-8'):
+	"""Yields the source entries of a bytes-like object in the one-line format
+
+	Produces the same valid and disabled entries as the parser of the
+	'aptsources' module but skips comments, blank lines and invalid lines
+	without decoding them. If 'buf' holds no entries at all, a single invalid
+	entry for its first line is yielded so that the file still shows up among
+	the loaded entries.
+	"""
+
+	match = _entry_line_pattern.match
+	find = buf.find
+	pos = 0
+	end = len(buf)
+	lineno = 0
+	found = False
+
+	while pos < end:
+		lineno += 1
+		m = match(buf, pos)
+		if m is not None:
+			pos = m.end()
+			se = _parse_source_entry(m, file, lineno, encoding)
+			if se is not None:
+				found = True
+				yield se
+		else:
+			pos = find(b'\n', pos) + 1 or end
+
+	if not found and buf:
+		line_end = find(b'\n') + 1 or end
+		yield SourceEntryView('', '', '', (), (), file, 1,
+			_decode(buf[:line_end], encoding), invalid=True)
+
+
+def _parse_source_entry(m, file, lineno, encoding):
+	options = m.group('options')
+	if options is None:
+		options = ()
+	else:
+		options = _decode(options.strip(b'[]'), encoding).split()
+		if not all(map(_is_valid_option, options)):
+			return None
+
+	comps = m.group('comps')
+	comps = (
+		(_field_pattern.findall(comps) if b'[' in comps else comps.split())
+		if comps else ())
+
+	return SourceEntryView(
+		_decode(m.group('type'), encoding), _decode(m.group('uri'), encoding),
+		_decode(m.group('dist'), encoding),
+		[_decode(c, encoding) for c in comps], options, file, lineno,
+		_decode(m.group(), encoding), disabled=m.start('disabled') >= 0)
+
+
+def _decode(b, encoding):
+	return str(b, encoding, 'surrogateescape')
+
+
+def _is_valid_option(option):
+	"""Tests whether an option is well-formed
+
+	i. e. of the form 'key=value', 'key+=value' or 'key-=value' like Apt expects.
+	Apt accepts any key, e. g. 'arch', 'signed-by', 'lang' or 'target'.
+	"""
+	return _option_pattern.match(option) is not None
+
+
+def _make_entry_line_pattern():
+	space = br'[ \t\v\f\r]'
+	# A field may contain whitespace inside brackets; a "#" starts a comment.
+	field_tail = br'[^\s\[#]*(?:\[[^\]\n#]*\]?[^\s\[#]*)*'
+	field = br'(?:\[[^\]\n#]*\]?|[^\s\[#])' + field_tail
+	field_no_bracket = br'[^\s\[#]' + field_tail
+
+	return re.compile(
+		space + br'*(?P<disabled>#' + space + br'*)?'
+		br'(?P<type>(?:deb|rpm)(?:-src)?)'
+		br'(?:' + space + br'+(?P<options>\[[^\]\n#]*\]?' + field_tail + br'))?' +
+		space + br'+(?P<uri>' + field_no_bracket + br')' +
+		space + br'+(?P<dist>' + field + br')'
+		br'(?P<comps>(?:' + space + br'+' + field + br')*)' +
+		space + br'*(?:#[^\n]*)?(?:\n|\Z)')
+
+
+# A whole line (when matched at its start) with an optional disabling "#", a
+# source type, optional options in brackets, a URI, a suite, optional
+# components and an optional comment
+_entry_line_pattern = _make_entry_line_pattern()
+
+# A single option inside the brackets of an entry line
+_option_pattern = re.compile(r'[\w.-]+?[+-]?=[^\s=]\S*\Z')
+
+# The '#' that disables an entry line and the surrounding whitespace
+_disabled_prefix_pattern = re.compile(r'^([ \t\v\f\r]*)#[ \t\v\f\r]*')
+
+# Whitespace-delimited fields where whitespace inside brackets doesn't count
+_field_pattern = re.compile(br'(?:\[[^\]]*\]?|[^\s\[])+')
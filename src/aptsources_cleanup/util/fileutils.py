@@ -1,5 +1,5 @@
 # -*- coding: utf-8
-__all__ = ("display_file", "remove_sources_files")
+__all__ = ("display_file", "remove_sources_files", "AtomicWriteBatch")
 
 import sys
 import mmap
@@ -52,3 +52,106 @@ def remove_sources_files(filename):
 				path=os.fspath(f)))
 
 	return rv, removed_count
+
+
+class AtomicWriteBatch:
+	"""Replaces the content of multiple files atomically and durably
+
+	write() stores the new content in a temporary file in the same directory as
+	its destination and syncs it to disk. commit() renames all temporary files
+	into place and then syncs each affected directory once, so that a crash
+	leaves each file either with its old or its new content but never
+	truncated. The temporary files are removed if the batch is aborted or if
+	its context is left with an exception.
+
+	If 'sync' is false, nothing is synced to disk which is faster but gives up
+	durability.
+	"""
+
+	__slots__ = ('sync', '_pending')
+
+
+	def __init__(self, sync=True):
+		self.sync = sync
+		self._pending = []
+
+
+	def write(self, path, data, encoding=None):
+		"""Writes a string or bytes object to a temporary file for 'path'
+
+		Symbolic links are followed so that their target is replaced. The new
+		file receives the permissions and, if possible, the ownership of the old
+		one.
+		"""
+
+		import tempfile
+
+		path = os.path.realpath(path)
+		st = os.stat(path)
+		dirname, basename = os.path.split(path)
+		fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.' + basename + '.')
+		try:
+			with open(fd, 'w' if isinstance(data, str) else 'wb',
+				encoding=encoding if isinstance(data, str) else None
+			) as f:
+				f.write(data)
+				f.flush()
+				os.fchmod(fd, st.st_mode & 0o7777)
+				try:
+					os.fchown(fd, st.st_uid, st.st_gid)
+				except PermissionError:
+					pass
+				if self.sync:
+					os.fsync(fd)
+		except BaseException:
+			os.remove(tmp_path)
+			raise
+
+		self._pending.append((tmp_path, path))
+
+
+	def commit(self):
+		"""Renames all written files into place and syncs their directories.
+
+		If a rename fails, the remaining temporary files are removed before the
+		exception is raised again. Files renamed before remain in place.
+		"""
+
+		pending = self._pending
+		dirs = {}
+		try:
+			while pending:
+				tmp_path, path = pending[0]
+				os.replace(tmp_path, path)
+				del pending[0]
+				dirs.setdefault(os.path.dirname(path), None)
+		except BaseException:
+			self.abort()
+			raise
+
+		if self.sync:
+			for dirname in dirs:
+				with io.FileDescriptor(dirname, os.O_RDONLY | os.O_DIRECTORY) as fd:
+					os.fsync(fd)
+
+
+	def abort(self):
+		"""Removes all written but uncommitted temporary files."""
+
+		for tmp_path, _ in self._pending:
+			try:
+				os.remove(tmp_path)
+			except FileNotFoundError:
+				pass
+		self._pending.clear()
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		if exc_type is None:
+			self.commit()
+		else:
+			self.abort()
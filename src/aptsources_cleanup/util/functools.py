@@ -104,6 +104,11 @@ def _get_instance(self):
 
 
 	def __getattr__(self, name):
+		# Protocol probes like ABCMeta's look-up of '__isabstractmethod__' must
+		# not instantiate the wrapped object.
+		if name.startswith('__') and name.endswith('__'):
+			raise AttributeError(name)
+
 		if self._li_type_hint is not None:
 			if self._li_strict:
 				value = getattr(self._li_type_hint, name)
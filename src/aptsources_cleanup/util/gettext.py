@@ -3,7 +3,7 @@
 __all__ = (
 	'translation', 'translations', '_', '_N', '_U',
 	'NullTranslations', 'GNUTranslations', 'DictTranslations',
-	'ChoiceInfo', 'Choices'
+	'LazyGNUTranslations', 'ChoiceInfo', 'Choices'
 )
 
 from . import terminal, collections
@@ -12,24 +12,20 @@
 from .strings import startswith_token, prefix, strip, contains_ordered
 from .operator import identity, methodcaller, peek, itemgetter0
 from .itertools import unique, last, filterfalse
-from .functools import LazyInstance, comp, partial as fpartial
-from .zipfile import ZipFile
+from .functools import LazyInstance, comp, partial as fpartial, lru_cache
 from .filesystem import dirseps
 import gettext as _gettext
 import operator
 import sys
 import os
+import re
 import errno
 import locale
+import struct
 import unicodedata
 from itertools import islice, starmap, chain as ichain
 from gettext import NullTranslations, GNUTranslations
 
-try:
-	import regex as re
-except ImportError:
-	import re
-
 
 try:
 	__archive__ = __loader__.archive
@@ -86,11 +82,13 @@ def translation(
 ):
 	"""Similar to gettext.translation() but also search inside ZIP archives
 
-	if this module is loaded from one.
+	if this module is loaded from one. '_class' defaults to LazyGNUTranslations.
 	"""
 
 	if languages is None:
 		languages = get_languages()
+	if _class is None:
+		_class = LazyGNUTranslations
 
 	archive = __archive__
 	if (
@@ -102,22 +100,16 @@ def translation(
 	languages = tuple(unique(get_fallback_languages(languages)))
 	translations = None
 	if languages:
-		assert startswith_token(localedir, archive, dirseps)
+		assert startswith_token(localedir, archive, tuple(dirseps))
 		localedir = strip(localedir, dirseps, start=len(archive) + len(os.sep))
-		locale_suffix = os.path.join('LC_MESSAGES', os.extsep.join((domain, 'mo')))
-		with ZipFile(archive) as archive:
-			#archive.debug = 3
-			for lang in languages:
-				lang_path = os.path.join(localedir, lang, locale_suffix)
-				#print('Trying', lang_path, '...', file=sys.stderr)
-				translation_file = archive.open(
-					lang_path, follow_symlinks=True, fail_missing=False)
-				if translation_file is not None:
-					with translation_file:
-						#print("Found language '{:s}' at '{:s}'.".format(lang, lang_path))
-						translations = (
-							(_class or GNUTranslations)(translation_file))
-					break
+		catalogs = _get_archive_catalogs(localedir, domain)
+		for lang in languages:
+			info = catalogs.get(lang)
+			if info is not None:
+				#print("Found language '{:s}' at '{:s}'.".format(lang, info.filename))
+				with _get_archive().open(info) as translation_file:
+					translations = _class(translation_file)
+				break
 
 	if translations is None:
 		if not fallback:
@@ -129,6 +121,50 @@ def translation(
 	return translations
 
 
+@lru_cache(maxsize=None)
+def _get_archive():
+	"""Returns the archive that this module is loaded from
+
+	It's opened only once and closed at exit.
+	"""
+
+	from .zipfile import ZipFile
+	import atexit
+	archive = ZipFile(__archive__)
+	#archive.debug = 3
+	atexit.register(archive.close)
+	return archive
+
+
+@lru_cache(maxsize=None)
+def _get_archive_catalogs(localedir, domain):
+	"""Returns a dictionary of languages to the message catalog members of a
+	domain below a locale directory inside the archive of this module
+
+	Symbolic links to language directories are resolved.
+	"""
+
+	archive = _get_archive()
+	localedir = localedir.replace(os.sep, '/')
+	dir_prefix = localedir + '/'
+	languages = {
+		name[len(dir_prefix):].partition('/')[0]
+		for name in archive.namelist() if name.startswith(dir_prefix)}
+	locale_suffix = '/'.join(('LC_MESSAGES', os.extsep.join((domain, 'mo'))))
+
+	catalogs = {}
+	for lang in filter(None, languages):
+		try:
+			info = archive.getinfo('/'.join((localedir, lang, locale_suffix)),
+				follow_symlinks=True, fail_missing=False)
+		except OSError:
+			# dangling or looping symbolic link
+			info = None
+		if info is not None:
+			catalogs[lang] = info
+	return catalogs
+
+
 def _make_translations():
 	global _, _N, translations
 	assert isinstance(translations, LazyInstance)
@@ -185,6 +221,235 @@ def lgettext(self, msg, *args):
 	lngettext = lgettext
 
 
+class LazyGNUTranslations(NullTranslations):
+	"""A replacement for GNUTranslations that looks up messages on demand
+
+	The catalog stays in a memory map of the '.mo' file or, for file objects
+	without a file descriptor like members of compressed archives, in a single
+	buffer. Only the header entry is parsed up front. Messages are found through
+	the hash table of the catalog or, if there is none, by binary search over
+	the sorted original strings and decoded on first use. Results are memoized.
+	"""
+
+	__slots__ = (
+		'plural', '_filename', '_data', '_memo', '_entry', '_hash_entry',
+		'_nstrings', '_orig_offset', '_trans_offset', '_hash_size',
+		'_hash_offset')
+
+	LE_MAGIC = 0x950412de
+	BE_MAGIC = 0xde120495
+
+	VERSIONS = (0, 1)
+
+
+	def __init__(self, fp=None):
+		self.plural = lambda n: int(n != 1)
+		self._memo = {}
+		self._nstrings = self._hash_size = 0
+		super().__init__(fp)
+
+
+	def _parse(self, fp):
+		self._filename = getattr(fp, 'name', '')
+		self._data = data = memoryview(self._map_file(fp))
+
+		magic = struct.unpack_from('<I', data)[0] if len(data) >= 28 else None
+		if magic == self.LE_MAGIC:
+			byteorder = '<'
+		elif magic == self.BE_MAGIC:
+			byteorder = '>'
+		else:
+			raise OSError(0, 'Bad magic number', self._filename)
+
+		(version, self._nstrings, self._orig_offset, self._trans_offset,
+			self._hash_size, self._hash_offset
+		) = struct.unpack_from(byteorder + '6I', data, 4)
+		if version >> 16 not in self.VERSIONS:
+			raise OSError(0, 'Bad version number ' + str(version >> 16),
+				self._filename)
+		self._entry = struct.Struct(byteorder + 'II')
+		self._hash_entry = struct.Struct(byteorder + 'I')
+
+		index = self._find(b'')
+		if index is not None:
+			self._parse_header(self._get_string(self._trans_offset, index))
+
+
+	@staticmethod
+	def _map_file(fp):
+		try:
+			fileno = fp.fileno()
+		except (AttributeError, OSError):
+			return fp.read()
+
+		import mmap
+		try:
+			return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+		except (ValueError, OSError):
+			# empty or unmappable file
+			return fp.read()
+
+
+	def _parse_header(self, header):
+		# Same as in GNUTranslations._parse()
+		lastk = None
+		for b_item in header.split(b'\n'):
+			item = b_item.decode().strip()
+			if not item:
+				continue
+			if item.startswith('#-#-#-#-#') and item.endswith('#-#-#-#-#'):
+				continue
+			k = v = None
+			if ':' in item:
+				k, v = item.split(':', 1)
+				k = k.strip().lower()
+				v = v.strip()
+				self._info[k] = v
+				lastk = k
+			elif lastk:
+				self._info[lastk] += '\n' + item
+			if k == 'content-type':
+				self._charset = v.split('charset=')[1]
+			elif k == 'plural-forms':
+				v = v.split(';')
+				plural = v[1].split('plural=')[1]
+				self.plural = _gettext.c2py(plural)
+
+
+	def _get_string(self, table_offset, index):
+		length, offset = self._entry.unpack_from(
+			self._data, table_offset + index * self._entry.size)
+		if offset + length > len(self._data):
+			raise OSError(0, 'File is corrupt', self._filename)
+		return bytes(self._data[offset:offset + length])
+
+
+	def _get_original(self, index):
+		"""Returns an original string without its plural form"""
+		return self._get_string(self._orig_offset, index).partition(b'\0')[0]
+
+
+	def _find(self, key):
+		"""Returns the index of an original string or None"""
+
+		if self._hash_size > 2:
+			size = self._hash_size
+			hval = _hash_string(key)
+			i = hval % size
+			incr = 1 + hval % (size - 2)
+			while True:
+				nstr, = self._hash_entry.unpack_from(
+					self._data, self._hash_offset + i * self._hash_entry.size)
+				if not nstr:
+					return None
+				if self._get_original(nstr - 1) == key:
+					return nstr - 1
+				i = i - (size - incr) if i >= size - incr else i + incr
+
+		lo = 0
+		hi = self._nstrings
+		while lo < hi:
+			mid = (lo + hi) // 2
+			original = self._get_original(mid)
+			if original < key:
+				lo = mid + 1
+			elif original > key:
+				hi = mid
+			else:
+				return mid
+		return None
+
+
+	def _lookup(self, message):
+		"""Returns the translation of a message, a tuple of its plural forms or
+		None if there is none
+		"""
+
+		memo = self._memo
+		try:
+			return memo[message]
+		except KeyError:
+			pass
+
+		charset = self._charset or 'ascii'
+		try:
+			index = self._find(message.encode(charset))
+		except UnicodeEncodeError:
+			index = None
+		if index is None:
+			tmsg = None
+		else:
+			tmsg = str(self._get_string(self._trans_offset, index), charset)
+			if b'\0' in self._get_string(self._orig_offset, index):
+				tmsg = tuple(tmsg.split('\0'))
+		memo[message] = tmsg
+		return tmsg
+
+
+	def _lookup_plural(self, msgid1, n):
+		tmsg = self._lookup(msgid1)
+		if isinstance(tmsg, tuple):
+			try:
+				return tmsg[self.plural(n)]
+			except IndexError:
+				pass
+		return None
+
+
+	def gettext(self, message):
+		tmsg = self._lookup(message)
+		if isinstance(tmsg, tuple):
+			tmsg = self._lookup_plural(message, 1)
+		if tmsg is not None:
+			return tmsg
+		if self._fallback:
+			return self._fallback.gettext(message)
+		return message
+
+
+	def ngettext(self, msgid1, msgid2, n):
+		tmsg = self._lookup_plural(msgid1, n)
+		if tmsg is not None:
+			return tmsg
+		if self._fallback:
+			return self._fallback.ngettext(msgid1, msgid2, n)
+		return msgid1 if n == 1 else msgid2
+
+
+	def pgettext(self, context, message):
+		ctxt_msg_id = context + '\x04' + message
+		tmsg = self._lookup(ctxt_msg_id)
+		if isinstance(tmsg, tuple):
+			tmsg = self._lookup_plural(ctxt_msg_id, 1)
+		if tmsg is not None:
+			return tmsg
+		if self._fallback:
+			return self._fallback.pgettext(context, message)
+		return message
+
+
+	def npgettext(self, context, msgid1, msgid2, n):
+		tmsg = self._lookup_plural(context + '\x04' + msgid1, n)
+		if tmsg is not None:
+			return tmsg
+		if self._fallback:
+			return self._fallback.npgettext(context, msgid1, msgid2, n)
+		return msgid1 if n == 1 else msgid2
+
+
+def _hash_string(s):
+	"""The hash function of GNU gettext for the hash tables of '.mo' files"""
+
+	hval = 0
+	for c in s:
+		hval = ((hval << 4) + c) & 0xffffffffffffffff
+		g = hval & 0xf0000000
+		if g:
+			hval ^= g >> 24
+			hval ^= g
+	return hval
+
+
 def normalize_casefold(text, *,
 	_casefold=str.casefold, _normalize=unicodedata.normalize
 ):
@@ -215,7 +480,8 @@ class ChoiceHighlighters(
 			.isdisjoint(frozenset("".join(unprintable_delimiters)))), \
 		'"unprintable_delimiters" contains regex meta-characters.'
 
-	unprintable_pattern = re.compile(r"(.*?)".join(unprintable_delimiters))
+	unprintable_pattern = LazyInstance(
+		fpartial(re.compile, r"(.*?)".join(unprintable_delimiters)))
 
 
 	@classmethod
@@ -234,9 +500,10 @@ def _call_with_positional_or_keyword_args(func, args):
 
 	@classmethod
 	def from_termcap(cls, capname, default=None, flags_func=None):
-		prefix = terminal.TERMMODES[capname]
+		termmodes = terminal.get_termmodes()
+		prefix = termmodes[capname]
 		if prefix:
-			suffix = terminal.TERMMODES['normal']
+			suffix = termmodes['normal']
 			if not suffix:
 				raise AssertionError(
 					"Terminal supports {!r} but no way to revert to normal???"
@@ -282,11 +549,44 @@ def _verify_unprintable_patterns(cls, s):
 		return s
 
 
+def _make_letter_pattern():
+	# Try to detect grapheme clusters if supported
+	try:
+		import regex as re
+	except ImportError:
+		import re
+
+	letter_pattern = r'(?=\S)\X'
+	try:
+		letter_pattern = re.compile(letter_pattern, re.UNICODE)
+	except re.error as ex:
+		assert ex.pos - 1 <= letter_pattern.index(r'\X') <= ex.pos
+		letter_pattern = None
+	else:
+		if not letter_pattern.match('A'):
+			letter_pattern = None
+	if letter_pattern is None:
+		# Fall back to simple letter detection
+		letter_pattern = re.compile(r'\S', re.UNICODE)
+		if __debug__:
+			terminal.termwrap.stderr().print(
+				"Warning: The regular expression module '{:s}' of your Python "
+				"installation lacks support for grapheme clusters.  If your "
+				"language's script includes composed graphemes that do not "
+				"correspond to a single Unicode codepoint the answer choice "
+				"short-hands may behave unexpectedly.  Please install the 'regex' "
+				"module to enable support for grapheme clusters."
+					.format(re.__name__), '\n\n')
+	return letter_pattern
+
+
 class Choices(collections.ChainMap):
 	"""Display a set of options and ask for a choice among them."""
 
-	default_highlighters = ChoiceHighlighters.from_termcaps(
-		('underline', '[{:s}]'), ('bold', str.upper, bool))
+	# Queries the terminal capabilities on first use
+	default_highlighters = LazyInstance(fpartial(
+		ChoiceHighlighters.from_termcaps,
+		('underline', '[{:s}]'), ('bold', str.upper, bool)))
 
 	debug = False
 
@@ -400,27 +700,8 @@ def _get_short_and_styled(cls, s, shorthand_highlighter, existing):
 		return (normalize_casefold(short), styled)
 
 
-	# Try to detect grapheme clusters if supported
-	letter_pattern = r'(?=\S)\X'
-	try:
-		letter_pattern = re.compile(letter_pattern, re.UNICODE)
-	except re.error as ex:
-		assert ex.pos - 1 <= letter_pattern.index(r'\X') <= ex.pos
-		letter_pattern = None
-	else:
-		if not letter_pattern.match('A'):
-			letter_pattern = None
-	if letter_pattern is None:
-		# Fall back to simple letter detection
-		letter_pattern = re.compile(r'\S', re.UNICODE)
-		if __debug__:
-			terminal.termwrap.stderr().print(
-				"Warning: The regular expression module '{:s}' of your Python "
-				"installation lacks support for grapheme clusters.  If your language's "
-				"script includes composed graphemes that do not correspond to a single "
-				"Unicode codepoint the answer choice short-hands may behave "
-				"unexpectedly.  Please install the 'regex' module to enable support "
-				"for grapheme clusters.".format(re.__name__), '\n\n')
+	# Compiled on first use
+	letter_pattern = LazyInstance(_make_letter_pattern)
 
 
 	def __str__(self):
@@ -5,7 +5,6 @@
 
 from .gettext import _
 from .io import FileDescriptor
-import subprocess
 
 
 def check_integrity(pkg, paragraphs, debug_fail=0, *,
@@ -16,6 +15,8 @@ def check_integrity(pkg, paragraphs, debug_fail=0, *,
 	...based on its checksum file and warn about possible issues.
 	"""
 
+	import subprocess
+
 	md5sums_file = '/var/lib/dpkg/info/{:s}.md5sums'.format(pkg)
 
 	try:
@@ -1,7 +1,22 @@
 # -*- coding: utf-8
-__all__ = ('EquivalenceRelation',)
-
+"""Equivalence relations over URI schemes and host names
+
+Both kinds of relations can be loaded from text files with one equivalence
+class per line and elements delimited by commas or white space. Blank lines
+and lines starting with '#' are ignored. Lines that share an element are
+merged into one class (see DisjointSets). save() writes the compiled relation
+in the 'marshal' format which load() recognizes and reads without compiling it
+again.
+"""
+
+__all__ = (
+	'EquivalenceRelation', 'HostEquivalenceRelation', 'DisjointSets',
+	'read_classes')
+
+import sys
+import marshal
 import itertools
+import os
 from operator import methodcaller
 from .functools import comp, partial as fpartial
 from .collections import ExtSet
@@ -42,10 +57,131 @@ def __str__(self):
 		return self._str_impl(self.order)
 
 
-class EquivalenceRelation(frozenset):
+class DisjointSets:
+	"""A union-find structure over hashable items
+
+	with path halving and union by size. classes() returns the sets in the
+	order of their first item and each set in the order of its items.
+	"""
+
+	__slots__ = ('parent', 'size')
+
+
+	def __init__(self):
+		self.parent = {}
+		self.size = {}
+
+
+	def add(self, item):
+		if item not in self.parent:
+			self.parent[item] = item
+			self.size[item] = 1
+
+
+	def find(self, item):
+		parent = self.parent
+		while parent[item] != item:
+			parent[item] = item = parent[parent[item]]
+		return item
+
+
+	def union(self, a, b):
+		self.add(a)
+		self.add(b)
+		a = self.find(a)
+		b = self.find(b)
+		if a != b:
+			if self.size[a] < self.size[b]:
+				a, b = b, a
+			self.parent[b] = a
+			self.size[a] += self.size.pop(b)
+
+
+	def classes(self):
+		classes = {}
+		for item in self.parent:
+			classes.setdefault(self.find(item), []).append(item)
+		return list(map(tuple, classes.values()))
+
+
+def read_classes(lines):
+	"""Reads and merges equivalence classes from an iterable of lines
+
+	as described in the module documentation and returns them as a list of
+	tuples.
+	"""
+
+	sets = DisjointSets()
+	for line in lines:
+		items = line.replace(',', ' ').split()
+		if items and not items[0].startswith('#'):
+			sets.add(items[0])
+			for item in items[1:]:
+				sets.union(items[0], item)
+	return sets.classes()
+
+
+class _SerializableRelation:
 
 	__slots__ = ()
 
+	MAGIC = b'aptsources-cleanup equivalence relation\n'
+
+	FORMAT = (1, marshal.version, sys.version_info[:2])
+
+
+	@classmethod
+	def load(cls, path, **kwargs):
+		"""Reads a relation from a text file or a file written by save()
+
+		Raises ValueError for invalid or incompatible files.
+		"""
+
+		with open(path, 'rb') as f:
+			data = f.read()
+		if data.startswith(cls.MAGIC):
+			try:
+				format, kind, compiled = marshal.loads(data[len(cls.MAGIC):])
+			except (ValueError, EOFError, TypeError):
+				format = kind = None
+			if format != cls.FORMAT or kind != cls.__qualname__:
+				raise ValueError(
+					'Incompatible compiled equivalence relation: ' + path)
+			return cls._from_compiled(compiled, **kwargs)
+
+		return cls(read_classes(
+			str(data, 'utf-8', 'surrogateescape').splitlines()), **kwargs)
+
+
+	def save(self, path):
+		"""Writes the compiled relation to a file atomically"""
+
+		import tempfile
+
+		dirname = os.path.dirname(path) or os.curdir
+		with tempfile.NamedTemporaryFile(
+			dir=dirname, prefix='.relation.', delete=False
+		) as f:
+			try:
+				f.write(self.MAGIC)
+				f.write(marshal.dumps(
+					(self.FORMAT, type(self).__qualname__, self._to_compiled())))
+			except BaseException:
+				os.remove(f.name)
+				raise
+		os.replace(f.name, path)
+
+
+class EquivalenceRelation(_SerializableRelation, frozenset):
+	"""A set of disjoint equivalence classes
+
+	Construction checks that the classes are disjoint in linear time and raises
+	ValueError otherwise. get_class() looks up the class of an element in an
+	index.
+	"""
+
+	__slots__ = ('_index',)
+
 
 	def __new__(cls, *classes, settype=FrozensetAltRepr):
 		if len(classes) == 1:
@@ -63,31 +199,37 @@ def __new__(cls, *classes, settype=FrozensetAltRepr):
 			except AttributeError:
 				pass
 
-		if __debug__:
-			overlapping = [
+		self._index = index = {}
+		overlapping = {}
+		for clazz in self:
+			for element in clazz:
+				other = index.setdefault(element, clazz)
+				if other is not clazz:
+					overlapping.setdefault((id(other), id(clazz)), (other, clazz))
+		if overlapping:
+			raise ValueError('Overlapping equivalence classes: ' + ', '.join(
 				"{:s} & {:s} = {:s}".format(
 					*map(FrozensetAltRepr._str_impl, (a, b, a & b)))
-				for a, b in itertools.combinations(self, 2) if not a.isdisjoint(b)
-			]
-			assert not overlapping, \
-				'Overlapping equivalence classes: ' + ', '.join(overlapping)
+				for a, b in overlapping.values()))
 
 		return self
 
 
 	def get_class(self, element):
-		containing_classes = filter(methodcaller('__contains__', element), self)
-		clazz = next(containing_classes, None)
-		if __debug__:
-			if clazz is not None:
-				try:
-					next(containing_classes)
-				except StopIteration:
-					pass
-				else:
-					raise AssertionError(
-						repr(element) + " appears in at least two classes")
-		return clazz
+		return self._index.get(element)
+
+
+	def _to_compiled(self):
+		ordered = any(isinstance(clazz, OrderedFrozenset) for clazz in self)
+		return (ordered, tuple(
+			tuple(clazz.order if ordered else clazz) for clazz in self))
+
+
+	@classmethod
+	def _from_compiled(cls, compiled, **kwargs):
+		ordered, classes = compiled
+		kwargs.setdefault('settype', 'ordered' if ordered else None)
+		return cls(classes, **kwargs)
 
 
 	@classmethod
@@ -169,17 +311,144 @@ def _format_parse_options(cls, s, classes):
 
 EquivalenceRelation.EMPTY = EquivalenceRelation()
 
+# All equivalence relations are indexed now.
+IndexedEquivalenceRelation = EquivalenceRelation
 
-class IndexedEquivalenceRelation(EquivalenceRelation):
 
-	__slots__ = ('_index',)
 
+class HostEquivalenceRelation(_SerializableRelation):
+	"""An equivalence relation over host names defined by host name patterns
 
-	def __init__(self, *args, **kwargs):
-		super().__init__(*args, **kwargs)
-		self._index = dict(itertools.chain.from_iterable(
-			zip(clazz, itertools.repeat(clazz)) for clazz in self))
+	A pattern is a host name whose labels may be '*' to match exactly one
+	label. A leading '*' label matches one or more labels instead and a leading
+	dot zero or more, e.g. '*.example.org' matches 'ftp.example.org' and
+	'a.b.example.org' while '.example.org' matches 'example.org' too. Host names
+	are compared case-insensitively.
 
+	All patterns are compiled into a trie over the reversed labels. A lookup
+	walks the labels of a host name once, preferring exact labels over
+	wildcards and longer matches over shorter ones, and its result is memoized.
+	"""
 
-	def get_class(self, element):
-		return self._index.get(element)
+	__slots__ = ('classes', '_trie', '_memo')
+
+	# Trie node keys that can't clash with labels
+	_EXACT = 0
+	_SUFFIX = 1
+
+
+	def __init__(self, classes=(), *, _trie=None):
+		self.classes = tuple(filter(None, (
+			tuple(filter(None, map(str.strip, clazz))) for clazz in classes)))
+		self._memo = {}
+		if _trie is not None:
+			self._trie = _trie
+		else:
+			self._trie = {}
+			for i, clazz in enumerate(self.classes):
+				for pattern in clazz:
+					self._add_pattern(pattern, i)
+
+
+	def _add_pattern(self, pattern, class_index):
+		labels = pattern.lower().rstrip('.').split('.')
+		if len(labels) > 1 and labels[0] == '*':
+			del labels[0]
+			markers = (self._SUFFIX,)
+		elif len(labels) > 1 and not labels[0]:
+			del labels[0]
+			markers = (self._EXACT, self._SUFFIX)
+		else:
+			markers = (self._EXACT,)
+		if not all(labels):
+			raise ValueError('Invalid host name pattern: ' + repr(pattern))
+
+		node = self._trie
+		for label in reversed(labels):
+			node = node.setdefault(label, {})
+		for marker in markers:
+			if node.setdefault(marker, class_index) != class_index:
+				raise ValueError(
+					'Host name pattern {!r} overlaps with another class'
+						.format(pattern))
+
+
+	def get_class(self, host):
+		"""Returns the tuple of patterns matching a host name or None"""
+
+		if not host:
+			return None
+		class_index = self._memo.get(host, False)
+		if class_index is False:
+			labels = host.lower().rstrip('.').split('.')
+			labels.reverse()
+			class_index = self._memo[host] = self._lookup(self._trie, labels, 0)
+		return None if class_index is None else self.classes[class_index]
+
+
+	def get_representative(self, host):
+		"""Returns the first pattern of the class of a host name or None"""
+
+		clazz = self.get_class(host)
+		return clazz and clazz[0]
+
+
+	@classmethod
+	def _lookup(cls, node, labels, i):
+		if i == len(labels):
+			return node.get(cls._EXACT)
+		for child in (node.get(labels[i]), node.get('*')):
+			if child is not None:
+				class_index = cls._lookup(child, labels, i + 1)
+				if class_index is not None:
+					return class_index
+		return node.get(cls._SUFFIX)
+
+
+	@classmethod
+	def parse(cls, s, item_delimiter=',', class_delimiter=';'):
+		return cls(map(methodcaller('split', item_delimiter),
+			s.split(class_delimiter)))
+
+
+	def _to_compiled(self):
+		return (self.classes, self._trie)
+
+
+	@classmethod
+	def _from_compiled(cls, compiled):
+		classes, trie = compiled
+		return cls(classes, _trie=trie)
+
+
+	def __bool__(self):
+		return bool(self.classes)
+
+
+	def __eq__(self, other):
+		if not isinstance(other, HostEquivalenceRelation):
+			return NotImplemented
+		return self.classes == other.classes
+
+
+	def __hash__(self):
+		return hash(self.classes)
+
+
+	def __getstate__(self):
+		return self.classes
+
+
+	def __setstate__(self, classes):
+		self.__init__(classes)
+
+
+	def __str__(self):
+		return '; '.join(map(', '.join, self.classes))
+
+
+	def __repr__(self):
+		return '{:s}({!r})'.format(type(self).__qualname__, self.classes)
+
+
+HostEquivalenceRelation.EMPTY = HostEquivalenceRelation()
@@ -4,7 +4,7 @@
 namely terminal capablities via Curses and text wrapping.
 """
 
-__all__ = ('try_input', 'termwrap', 'TERMMODES')
+__all__ = ('try_input', 'termwrap', 'get_termmodes')
 
 import os
 import sys
@@ -13,31 +13,38 @@
 import textwrap
 import collections.abc
 from . import io
-from operator import itemgetter
 from .operator import methodcaller
 from .itertools import accumulate, foreach
-from functools import partial as fpartial
+from functools import partial as fpartial, lru_cache
 
 
-TERMMODES = (('bold', 'bold'), ('underline', 'smul'), ('normal', 'sgr0'))
+_TERMMODE_CAPNAMES = (('bold', 'bold'), ('underline', 'smul'), ('normal', 'sgr0'))
 
-if io.isatty(sys.stdout):
-	try:
-		import curses
-		curses.setupterm()
-	except (ImportError, OSError) as ex:
-		if __debug__:
-			print('Warning', ex, sep=': ', end='\n\n', file=sys.stderr)
-		curses = None
-else:
-	curses = None
 
-if curses is None:
-	TERMMODES = dict.fromkeys(map(itemgetter(0), TERMMODES), '')
-else:
-	TERMMODES = {
-		k: (curses.tigetstr(capname) or b'').decode('ascii')
-		for k, capname in TERMMODES
+@lru_cache(maxsize=None)
+def get_termmodes():
+	"""Returns a dictionary of terminal mode names to their control sequences
+
+	Curses is only set up on the first call and only if standard output is a
+	terminal; otherwise all control sequences are empty.
+	"""
+
+	curses = None
+	if io.isatty(sys.stdout):
+		try:
+			import curses
+			curses.setupterm()
+		except (ImportError, OSError) as ex:
+			if __debug__:
+				print('Warning', ex, sep=': ', end='\n\n', file=sys.stderr)
+			curses = None
+
+	if curses is None:
+		return dict.fromkeys(
+			(name for name, _capname in _TERMMODE_CAPNAMES), '')
+	return {
+		name: (curses.tigetstr(capname) or b'').decode('ascii')
+		for name, capname in _TERMMODE_CAPNAMES
 	}
 
 
@@ -6,7 +6,7 @@
 import errno
 import operator
 import functools
-from . import os, strings, collections
+from . import os, strings
 from .itertools import filterfalse
 from .operator import methodcaller, identity as _sanitize_path_sep
 
@@ -20,10 +20,25 @@
 
 
 class ZipFile(_zipfile.ZipFile):
-	"""Extends zipfile.ZipFile with in-archive resolution of symbolic links"""
+	"""Extends zipfile.ZipFile with in-archive resolution of symbolic links
+
+	The symbolic links of the archive are read and resolved once and the results
+	of path resolution are memoized in a bounded cache.
+	"""
 
 	_max_path = 64 << 10
 
+	_max_resolved_paths = 1 << 10
+
+
+	def __init__(self, *args, **kwargs):
+		self._symlinks = None
+		self._symlinks_count = None
+		self._resolved_symlinks = None
+		self._resolve_name = functools.lru_cache(self._max_resolved_paths)(
+			self._resolve_name_impl)
+		super().__init__(*args, **kwargs)
+
 
 	def getinfo(self, name, pwd=None, *, follow_symlinks=False,
 		fail_missing=True
@@ -67,65 +82,119 @@ def _resolve_path(self, path, pwd, fail_missing):
 		else:
 			path = _sanitize_path_sep(os.fspath(path))
 		assert os.sep == "/" or os.sep not in path
-		is_dir = path.endswith("/")
-		path = path.strip("/")
 
-		inspected = []
-		uninspected = path.split("/")
-		uninspected.reverse()
-		seen_set = collections.ExtSet()
-		c_info = None
+		self._get_symlinks(pwd)
+		name = self._resolve_name(path, pwd)
+		return self._check_missing(
+			name and self.NameToInfo.get(name), path.strip("/"), fail_missing)
+
 
-		while uninspected:
-			c_info = self._resolve_path_component(
-				inspected, uninspected, pwd, seen_set)
+	def _resolve_name_impl(self, path, pwd):
+		"""Returns the member name that a path resolves to or None for the root"""
 
-		if is_dir and inspected:
+		inspected = self._resolve_components(
+			path.strip("/").split("/"), [], pwd, set())
+		if not inspected:
+			return None
+		if path.endswith("/"):
 			inspected.append("")
-			c_info = self.NameToInfo.get("/".join(inspected))
+		return "/".join(inspected)
 
-		return self._check_missing(c_info, path, fail_missing)
 
+	def _resolve_components(self, components, inspected, pwd, resolving):
+		"""Appends path components to the resolved path components 'inspected'
 
-	def _resolve_path_component(self, inspected, uninspected, pwd, seen_set):
-		c = uninspected.pop()
-		#_eprintf('_resolve_path_component(): {!r}, {!r}, {!r}', inspected, c, uninspected)
+		and replaces symbolic links with their resolved targets. 'resolving' is the
+		set of symbolic links currently being resolved.
+		"""
 
-		if not c or c == os.curdir:
-			return None
+		for c in components:
+			if not c or c == os.curdir:
+				continue
 
-		if c == os.pardir:
-			if not inspected:
-				uninspected.append(c)
-				uninspected.reverse()
-				raise self._OSError(
-					errno.ENOENT, 'Path points outside of this archive',
-					"/".join(uninspected))
-			inspected.pop()
-			return None
+			if c == os.pardir:
+				if not inspected:
+					raise self._OSError(
+						errno.ENOENT, 'Path points outside of this archive',
+						"/".join(components))
+				inspected.pop()
+				continue
+
+			inspected.append(c)
+			target = self._get_resolved_symlink("/".join(inspected), pwd, resolving)
+			if target is not None:
+				inspected[:] = target
+
+		return inspected
 
-		inspected.append(c)
-		c_full = "/".join(inspected)
-		c_info = self.NameToInfo.get(c_full)
-		if c_info is None or not stat.S_ISLNK(c_info.external_attr >> 16):
-			if self.debug >= 2:
-				_eprintf('{:s}: {!r}',
-					('Not a symlink', 'Does not exist')[c_info is None],
-					':'.join((self.filename, c_full)))
-			return c_info
-		if _info_is_dir(c_info):
+
+	def _get_resolved_symlink(self, name, pwd, resolving):
+		"""Returns the resolved target of a symbolic link as a list of path
+		components or None if 'name' is no symbolic link
+
+		Each symbolic link is resolved only once. Errors, e. g. due to loops, are
+		remembered and raised again on later look-ups.
+		"""
+
+		resolved = self._resolved_symlinks.get(name)
+		if resolved is None:
+			target = self._symlinks.get(name)
+			if target is None:
+				return None
+			if isinstance(target, Exception):
+				resolved = target
+			elif name in resolving:
+				raise self._OSError(errno.ELOOP, None, name)
+			else:
+				resolving.add(name)
+				try:
+					resolved = tuple(self._resolve_components(
+						target.rstrip("/").split("/"), name.split("/")[:-1], pwd,
+						resolving))
+					if sum(map(len, resolved)) + len(resolved) > self._max_path:
+						raise self._OSError(errno.ENAMETOOLONG, None, name)
+				except (OSError, BadZipFile) as ex:
+					resolved = ex
+				finally:
+					resolving.discard(name)
+			self._resolved_symlinks[name] = resolved
+
+		if isinstance(resolved, Exception):
+			raise resolved
+		return list(resolved)
+
+
+	def _get_symlinks(self, pwd=None):
+		"""Returns a dictionary of the names of the symbolic links in this archive
+		to their targets or to the errors that occurred while reading them
+
+		The table is built on first use and again only after members were added.
+		"""
+
+		if self._symlinks_count != len(self.filelist):
+			symlinks = {}
+			for info in self.NameToInfo.values():
+				if stat.S_ISLNK(info.external_attr >> 16):
+					try:
+						symlinks[info.filename] = self._check_symlink(info, pwd)
+					except (OSError, BadZipFile, RuntimeError) as ex:
+						symlinks[info.filename] = ex
+			self._symlinks = symlinks
+			self._symlinks_count = len(self.filelist)
+			self._resolved_symlinks = {}
+			self._resolve_name.cache_clear()
+
+		return self._symlinks
+
+
+	def _check_symlink(self, info, pwd):
+		if _info_is_dir(info):
 			raise BadZipFile(
 				"{:s}:{!r} claims to be both a directory and a symbolic link."
-					.format(self.filename, c_info))
-		if len(c_info.filename) - len(c) + c_info.file_size > self._max_path:
-			raise self._OSError(errno.ENAMETOOLONG, None, c_info.filename)
-
-		if not seen_set.add(c_info.filename):
-			raise self._OSError(errno.ELOOP, None, c_info.filename)
-		uninspected.extend(reversed(
-			self._read_symlink(c_info, pwd).rstrip("/").split("/")))
-		inspected.pop()
-		return c_info
+					.format(self.filename, info))
+		if info.file_size > self._max_path:
+			raise self._OSError(errno.ENAMETOOLONG, None, info.filename)
+		return self._read_symlink(info, pwd)
 
 
 	def _read_symlink(self, info, pwd):
@@ -212,8 +281,13 @@ def error(self, message):
 	ap.add_argument('archive',
 		type=argparse.FileType('rb'),
 		help='Path to a ZIP archive')
-	ap.add_argument('paths', nargs='+',
+	ap.add_argument('paths', nargs='*',
 		help='Archive member paths to inspect')
+	ap.add_argument('-b', '--batch', metavar='FILE',
+		type=argparse.FileType('r'),
+		help='Read additional archive member paths to inspect from FILE, one per '
+			'line, or from standard input for "-". All paths share the same cache '
+			'of resolved symbolic links and paths.')
 	ap.add_argument('-L', '--follow-symlinks', metavar='N',
 		type=int, default=1,
 		help='Follow symbolic links during archive member inspection if N != 0.')
@@ -228,19 +302,34 @@ def error(self, message):
 		metavar='N', type=int, default=0,
 		help='Set debugging level directly.')
 
-	return ap.parse_args(args)
+	args = ap.parse_args(args)
+	if not args.paths and args.batch is None:
+		ap.error('Either an archive member path or the option "--batch" is required.')
+	return args
 
 
 def _main(args=None):
 	args = _parse_args(args)
 
+	paths = args.paths
+	if args.batch is not None:
+		with args.batch:
+			paths = paths + list(filter(None, map(
+				methodcaller(str.rstrip, "\n"), args.batch)))
+
+	rv = 0
 	with args.archive, ZipFile(args.archive) as archive:
 		archive.debug = args.debug
 		getinfo = functools.partial(ZipFile.getinfo, archive,
 			follow_symlinks=args.follow_symlinks, fail_missing=False)
 
-		for path in args.paths:
-			resolved_info = getinfo(path)
+		for path in paths:
+			try:
+				resolved_info = getinfo(path)
+			except (OSError, BadZipFile) as ex:
+				_eprintf('{:s}: {!r} => {!s}', archive.filename, path, ex)
+				rv = 1
+				continue
 			if resolved_info is not None:
 				print('{:s}: {!r} => {!r}'.format(
 					archive.filename, path, resolved_info.filename))
@@ -248,7 +337,13 @@ def _main(args=None):
 				_eprintf(
 					'{:s}: {!r} => No such archive entry or dangling symbolic link',
 					archive.filename, path)
+				rv = 1
+
+		if archive.debug >= 1 and args.follow_symlinks:
+			_eprintf('Resolved path cache: {}', archive._resolve_name.cache_info())
+
+	return rv
 
 
 if __name__ == '__main__':
-	_main()
+	sys.exit(_main())
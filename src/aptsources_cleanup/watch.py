@@ -0,0 +1,302 @@
+# -*- coding: utf-8
+"""Incremental duplicate detection for sources list directories under change
+
+A DuplicateIndex holds the keyed source entries of all sources list files and
+updates the affected sets of duplicates when a single file changes. Changes
+are detected with the Linux inotify API.
+"""
+
+__all__ = ('DuplicateIndex', 'Inotify', 'watch', 'get_locations')
+
+from . import get_keyed_entries, get_scheme_rank
+from .sources import SourcesListView, read_source_entries
+from .util.relations import EquivalenceRelation
+import os
+import errno
+import struct
+import ctypes
+import ctypes.util
+
+
+class DuplicateIndex:
+	"""Groups the source entries of multiple files by their duplicate detection
+	keys and keeps the groups up to date as files change
+
+	The first entry of a set of duplicates is chosen by scheme rank (see
+	get_scheme_rank()), file name and line number so that it doesn't depend
+	on the order of changes.
+	"""
+
+	__slots__ = ('equivalent_schemes', 'equivalent_hosts', 'files', 'groups')
+
+
+	def __init__(self, equivalent_schemes=None, equivalent_hosts=None):
+		if equivalent_schemes is None:
+			equivalent_schemes = EquivalenceRelation.EMPTY
+		self.equivalent_schemes = equivalent_schemes
+		self.equivalent_hosts = equivalent_hosts
+		self.files = {}
+		self.groups = {}
+
+
+	def update_file(self, file, entries):
+		"""Replaces the entries of a file
+
+		Returns a dictionary of the affected keys to the locations of their
+		duplicates before the update (see get_locations()).
+		"""
+
+		affected = self.remove_file(file)
+		sourceslist = SourcesListView()
+		sourceslist.list = entries
+		keyed_entries = tuple(
+			get_keyed_entries(
+				sourceslist, self.equivalent_schemes, self.equivalent_hosts))
+		self.files[file] = keyed_entries
+
+		for key, se in keyed_entries:
+			if key not in affected:
+				affected[key] = get_locations(self.get_duplicates(key))
+			group = self.groups.get(key)
+			if group is None:
+				group = self.groups[key] = {}
+			group[id(se)] = se
+
+		return affected
+
+
+	def remove_file(self, file):
+		"""Removes the entries of a file
+
+		Returns a dictionary of the affected keys to the locations of their
+		duplicates before the removal (see get_locations()).
+		"""
+
+		affected = {}
+		for key, se in self.files.pop(file, ()):
+			if key not in affected:
+				affected[key] = get_locations(self.get_duplicates(key))
+			group = self.groups[key]
+			del group[id(se)]
+			if not group:
+				del self.groups[key]
+		return affected
+
+
+	def get_duplicates(self, key):
+		"""Returns the sorted list of entries with a key if there are duplicates
+
+		or None otherwise.
+		"""
+
+		group = self.groups.get(key)
+		if group is None or len(group) < 2:
+			return None
+		# Entries of the same deb822 stanza don't count as duplicates.
+		origin = next(iter(group.values())).origin
+		if all(se.origin is origin for se in group.values()):
+			return None
+		return sorted(group.values(), key=self._get_order)
+
+
+	def iter_duplicates(self):
+		"""Yields pairs of keys and sorted lists of duplicate entries."""
+
+		for key in self.groups:
+			dupe_set = self.get_duplicates(key)
+			if dupe_set is not None:
+				yield (key, dupe_set)
+
+
+	def _get_order(self, se):
+		return (
+			get_scheme_rank(self.equivalent_schemes, se), se.file, se.lineno)
+
+
+class Inotify:
+	"""A minimal wrapper around the Linux inotify API using ctypes"""
+
+	__slots__ = ('fd', 'watches')
+
+	IN_CLOSE_WRITE = 0x008
+	IN_MOVED_FROM = 0x040
+	IN_MOVED_TO = 0x080
+	IN_DELETE = 0x200
+	IN_Q_OVERFLOW = 0x4000
+
+	_event_header = struct.Struct('iIII')
+
+	_libc = None
+
+
+	def __init__(self):
+		libc = self._get_libc()
+		fd = libc.inotify_init1(os.O_CLOEXEC)
+		if fd < 0:
+			self._raise_errno()
+		self.fd = fd
+		self.watches = {}
+
+
+	@classmethod
+	def _get_libc(cls):
+		libc = cls._libc
+		if libc is None:
+			libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+			if not hasattr(libc, 'inotify_init1'):
+				raise OSError(errno.ENOSYS, 'inotify is not supported')
+			cls._libc = libc
+		return libc
+
+
+	@staticmethod
+	def _raise_errno(path=None):
+		err = ctypes.get_errno()
+		raise OSError(err, os.strerror(err), path)
+
+
+	def add_watch(self, path, mask):
+		wd = self._get_libc().inotify_add_watch(self.fd, os.fsencode(path), mask)
+		if wd < 0:
+			self._raise_errno(path)
+		self.watches[wd] = path
+		return wd
+
+
+	def read_events(self, bufsize=1 << 16):
+		"""Blocks until events are available and returns a list of them
+
+		as tuples of the watched path, the event mask and the file name (or None
+		for events of the watched path itself).
+		"""
+
+		data = os.read(self.fd, bufsize)
+		events = []
+		pos = 0
+		header = self._event_header
+		while pos < len(data):
+			wd, mask, _, length = header.unpack_from(data, pos)
+			pos += header.size
+			name = data[pos:pos + length].rstrip(b'\0')
+			pos += length
+			events.append((self.watches.get(wd), mask,
+				os.fsdecode(name) if name else None))
+		return events
+
+
+	def close(self):
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+
+def get_locations(dupe_set):
+	"""Returns a tuple of file names, line numbers and lines of a list of
+	entries or None for None.
+	"""
+
+	if dupe_set is None:
+		return None
+	return tuple((se.file, se.lineno, se.line) for se in dupe_set)
+
+
+def is_sources_file(name):
+	return name.endswith(('.list', '.sources'))
+
+
+def watch(files, dirs, on_change, equivalent_schemes=None, inotify=None,
+	equivalent_hosts=None
+):
+	"""Watches sources list files and directories for changes
+
+	'files' are the initially present sources list files and 'dirs' the
+	directories to watch for added, changed and removed sources list files.
+	Files outside of these directories are watched too. 'on_change(index,
+	changes, errors)' is called once with all initial sets of duplicates and
+	then after each batch of events that changed any set of duplicates.
+	'changes' is a list of triples of a key, its new sorted list of duplicate
+	entries (or None) and the locations of the duplicates before the change
+	(or None); 'errors' is a list of EnvironmentError objects. Only the changed
+	files are parsed again. Runs until 'on_change()' returns a true value.
+	"""
+
+	# Normalize all paths so that each directory has a single watch and the
+	# files of changes match those of the index.
+	files = [os.path.normpath(file) for file in files]
+	dirs = [os.path.normpath(dirname) for dirname in dirs]
+
+	index = DuplicateIndex(equivalent_schemes, equivalent_hosts)
+	errors = []
+
+	def update(file):
+		entries = read_source_entries(file)
+		if isinstance(entries, EnvironmentError):
+			if entries.errno != errno.ENOENT:
+				errors.append(entries)
+			return index.remove_file(file)
+		return index.update_file(file, entries)
+
+	for file in files:
+		update(file)
+	if on_change(index,
+		[(key, dupe_set, None) for key, dupe_set in index.iter_duplicates()],
+		errors
+	):
+		return
+
+	# Map each watched directory to the names of the watched files inside or
+	# None for all sources list files which includes any named files.
+	watched = dict.fromkeys(dirs)
+	for file in files:
+		dirname, name = os.path.split(file)
+		names = watched.setdefault(dirname, set())
+		if names is not None:
+			names.add(name)
+
+	if inotify is None:
+		inotify = Inotify()
+	mask = (Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO | Inotify.IN_MOVED_FROM |
+		Inotify.IN_DELETE)
+
+	with inotify:
+		for dirname in watched:
+			inotify.add_watch(dirname, mask)
+
+		while True:
+			changed = {}
+			for dirname, event_mask, name in inotify.read_events():
+				if event_mask & Inotify.IN_Q_OVERFLOW:
+					# Events were lost; re-read all watched files once.
+					changed.update(dict.fromkeys(index.files))
+					for watched_dir, names in watched.items():
+						changed.update(dict.fromkeys(
+							os.path.join(watched_dir, name)
+							for name in os.listdir(watched_dir)
+							if (is_sources_file(name) if names is None else name in names)))
+				elif dirname is not None and name is not None:
+					names = watched[dirname]
+					if is_sources_file(name) if names is None else name in names:
+						changed[os.path.join(dirname, name)] = None
+
+			errors = []
+			affected = {}
+			for file in changed:
+				for key, old_locations in update(file).items():
+					affected.setdefault(key, old_locations)
+
+			changes = []
+			for key, old_locations in affected.items():
+				dupe_set = index.get_duplicates(key)
+				if get_locations(dupe_set) != old_locations:
+					changes.append((key, dupe_set, old_locations))
+
+			if (changes or errors) and on_change(index, changes, errors):
+				return
@@ -0,0 +1,594 @@
+#!/usr/bin/python3 -O
+# -*- coding: utf-8
+
+"""Benchmarks for the hot paths of aptsources-cleanup
+
+Each benchmark is a sub-command. Use '--help' for details.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+
+import aptsources_cleanup
+from aptsources_cleanup.sources import SourcesListView
+from aptsources_cleanup.scancache import ScanCache
+from aptsources_cleanup.util import fileutils
+from aptsources_cleanup.util.operator import identity
+from aptsources_cleanup.util.relations import EquivalenceRelation
+from aptsources_cleanup.__main__ import (
+	load_sources_dir, sort_dupe_set_by_scheme_class)
+from synthetic_tree import TreeGenerator, generate_tree
+
+
+class SyntheticSourceEntry:
+	"""A minimal stand-in for aptsources.sourceslist.SourceEntry"""
+
+	__slots__ = (
+		"type", "uri", "dist", "comps", "file", "line", "invalid", "disabled",
+		"parsed_uri")
+
+
+	def __init__(self, type, uri, dist, comps, file):
+		self.type = type
+		self.uri = uri
+		self.dist = dist
+		self.comps = comps
+		self.file = file
+		self.line = " ".join((type, uri, dist) + tuple(comps))
+		self.invalid = False
+		self.disabled = False
+
+
+class SyntheticSourcesList:
+
+	__slots__ = ("list",)
+
+
+	def __init__(self, entries):
+		self.list = entries
+
+
+def make_synthetic_entries(count, seed=0, mirror_count=300):
+	"""Returns a list of 'count' random source entries
+
+	drawn from a pool of 'mirror_count' mirror URIs, each with its own suite and
+	components, as they repeat across many hosts. The same seed always yields
+	the same entries.
+	"""
+
+	rng = random.Random(seed)
+	suites = ("trusty", "xenial", "bionic", "focal", "stable", "./")
+	comps = (("main",), ("main", "universe"), ("main", "restricted"),
+		("contrib", "non-free"), ())
+	sources = [
+		(rng.choice(("deb", "deb-src")),
+			"{:s}://mirror{:d}.example.org/{:s}{:s}".format(
+				rng.choice(("http", "https", "ftp")), i,
+				rng.choice(("ubuntu", "debian", "ppa/owner{:d}/ubuntu".format(i))),
+				rng.choice(("", "/"))),
+			rng.choice(suites), rng.choice(comps))
+		for i in range(mirror_count)
+	]
+
+	return [
+		SyntheticSourceEntry(*rng.choice(sources),
+			file="/etc/apt/sources.list.d/{:d}.list".format(i // 8))
+		for i in range(count)
+	]
+
+
+def timeit(func, repeat, setup=None):
+	"""Returns the best of 'repeat' wall-clock times of func() in seconds.
+
+	'setup()' is called before each run and not timed.
+	"""
+
+	best = float("inf")
+	for _ in range(repeat):
+		if setup is not None:
+			setup()
+		start = time.perf_counter()
+		func()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def bench_normalize(args):
+	"""Compares the per-entry cost of duplicate detection with and without the
+	normalization cache.
+	"""
+
+	sourceslist = SyntheticSourcesList(
+		make_synthetic_entries(args.count, args.seed, args.mirrors))
+	equivalent_schemes = EquivalenceRelation(
+		(("http", "https", "ftp"),), settype="ordered")
+	run = lambda: tuple(
+		aptsources_cleanup.get_duplicates(sourceslist, equivalent_schemes))
+
+	cached = aptsources_cleanup._normalize_source_entry
+	intern_key = aptsources_cleanup._intern_key
+	try:
+		aptsources_cleanup._normalize_source_entry = cached.__wrapped__
+		aptsources_cleanup._intern_key = identity
+		uncached_time = timeit(run, args.repeat)
+	finally:
+		aptsources_cleanup._normalize_source_entry = cached
+		aptsources_cleanup._intern_key = intern_key
+
+	def run_cold():
+		cached.cache_clear()
+		intern_key.cache_clear()
+		run()
+
+	cached_time = timeit(run_cold, args.repeat)
+
+	print("entries: {:d}, distinct mirrors: {:d}".format(
+		len(sourceslist.list), args.mirrors))
+	for label, t in (("uncached", uncached_time), ("cached", cached_time)):
+		print("{:>8s}: {:8.3f} µs/entry ({:.3f} s total)".format(
+			label, t / len(sourceslist.list) * 1e6, t))
+	print("   cache:", cached.cache_info())
+
+
+def bench_parse(args):
+	"""Measures the throughput of the built-in sources list parser and the one
+	of the 'aptsources' module.
+	"""
+
+	files = find_sources_files(args.paths)
+	size = sum(map(os.path.getsize, files))
+	results = {}
+
+	for label, load in (
+		("builtin", SourcesListView.load),
+		("aptsources", SourcesListView.load_aptsources),
+	):
+		def run():
+			sourceslist = SourcesListView()
+			for _ in range(args.count):
+				for file in files:
+					load(sourceslist, file)
+			results[label] = sourceslist
+
+		t = timeit(run, args.repeat)
+		print("{:>10s}: {:8.3f} MB/s ({:d} files, {:.3f} s total)".format(
+			label, size * args.count / t / 1e6, len(files) * args.count, t))
+
+	summarize = lambda sourceslist: [
+		(se.file, se.lineno, se.type, se.uri, se.dist, se.comps, se.disabled)
+		for se in sourceslist.list if not se.invalid
+	]
+	print("Same valid and disabled entries:",
+		summarize(results["builtin"]) == summarize(results["aptsources"]))
+	print("Same entries in the one-line and deb822 formats:",
+		check_format_parity(args.seed))
+
+
+def check_format_parity(seed, count=200):
+	"""Tests whether the built-in parser reads the same entries from synthetic
+	one-line and deb822 style files.
+
+	The entries include options like 'signed-by' that older versions of the
+	'aptsources' module reject.
+	"""
+
+	generator = TreeGenerator(seed, comment_rate=0)
+	entries = [
+		generator.new_entry(kind)
+		for kind in itertools.islice(
+			itertools.cycle(("ppa", "vendor", "mirror")), count)
+	]
+	summarize = lambda sourceslist: [
+		(se.type, se.uri, se.dist, tuple(se.comps), tuple(sorted(se.options)))
+		for se in sourceslist.list if not se.invalid and not se.disabled
+	]
+
+	results = []
+	with tempfile.TemporaryDirectory() as tmpdir:
+		for name, content in (
+			("entries.list", generator.format_lines(entries)),
+			("entries.sources", generator.format_stanzas(entries)),
+		):
+			path = os.path.join(tmpdir, name)
+			with open(path, "w") as f:
+				f.writelines(content)
+			sourceslist = SourcesListView()
+			sourceslist.load(path)
+			results.append(summarize(sourceslist))
+
+	return len(results[0]) == count and results[0] == results[1]
+
+
+def bench_scan_cache(args):
+	"""Compares loading sources list files with an empty (cold) and a filled
+	(warm) scan cache.
+	"""
+
+	files = find_sources_files(args.paths)
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		path = os.path.join(tmpdir, "scan-cache")
+
+		def run(warm):
+			for _ in range(args.count):
+				cache = (
+					ScanCache.load(path, args.hash) if warm
+					else ScanCache(path, args.hash))
+				SourcesListView().load_all(files, cache=cache)
+				cache.save()
+
+		cold_time = timeit(lambda: run(False), args.repeat)
+		warm_time = timeit(lambda: run(True), args.repeat)
+		cache = ScanCache.load(path)
+		print("files: {:d}, cached: {:d}, cache size: {:d} bytes".format(
+			len(files), len(cache.files), os.path.getsize(path)))
+
+	for label, t in (("cold", cold_time), ("warm", warm_time)):
+		print("{:>5s}: {:8.3f} ms/run ({:.3f} s total)".format(
+			label, t / args.count * 1e3, t))
+
+
+def bench_save(args):
+	"""Measures the cost of saving sources list files with one disabled entry
+	each, with and without syncing them to disk.
+	"""
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		files = write_synthetic_tree(
+			tmpdir, args.count, args.dirs, args.lines, args.seed)
+		sourceslist = SourcesListView()
+		sourceslist.load_all(files)
+		changed_bytes = 0
+		toggled = []
+		for file in files:
+			se = next(se for se in sourceslist if se.file == file)
+			se.disabled = True
+			changed_bytes += len(se.str()) - len(se.line)
+			toggled.append(se)
+		written_bytes = sum(map(os.path.getsize, files))
+
+		fsync = fileutils.os.fsync
+		fsync_count = 0
+		def counting_fsync(fd):
+			nonlocal fsync_count
+			fsync_count += 1
+			return fsync(fd)
+
+		# Saving marks the entries as saved; toggle them again before every save
+		# so that each run writes all files.
+		def toggle():
+			for se in toggled:
+				if not se.is_modified():
+					se.disabled = not se.disabled
+
+		results = []
+		try:
+			fileutils.os.fsync = counting_fsync
+			for sync in (False, True):
+				fsync_count = 0
+				t = timeit(lambda: sourceslist.save(sync), args.repeat, toggle)
+				results.append((sync, t, fsync_count // args.repeat))
+		finally:
+			fileutils.os.fsync = fsync
+
+	print("files: {:d} in {:d} directories, {:d} bytes written for {:d} changed "
+		"bytes (write amplification {:.1f})".format(
+			len(files), args.dirs, written_bytes, changed_bytes,
+			written_bytes / changed_bytes))
+	for sync, t, fsync_count in results:
+		print("{:>8s}: {:8.3f} ms/file ({:.3f} s total, {:d} fsync calls)".format(
+			"durable" if sync else "unsynced", t / len(files) * 1e3, t,
+			fsync_count))
+
+
+SUITE_FORMAT = 1
+
+SUITE_PHASES = (
+	"load_sources_dir", "get_duplicates", "get_overlaps", "get_empty_files",
+	"sort_dupe_set_by_scheme_class", "save")
+
+SUITE_EQUIVALENT_SCHEMES = EquivalenceRelation(
+	(("http", "https", "ftp"),), settype="ordered")
+
+
+def bench_suite(args):
+	"""Times each stage of the core pipeline on synthetic trees of increasing
+	size and writes the results as JSON.
+	"""
+
+	results = []
+	for count in args.sizes:
+		with tempfile.TemporaryDirectory() as tmpdir:
+			stats = generate_tree(tmpdir, count, args.seed,
+				duplicate_rate=args.duplicate_rate)
+			mismatches = check_tree(tmpdir, stats)
+			if mismatches:
+				print("The pipeline disagrees with the generator of the tree with",
+					count, "entries:", ", ".join(mismatches), file=sys.stderr)
+				return 1
+			phases = run_suite_phases(tmpdir, args.repeat)
+		stats["duplicate_sets"] = phases.pop("duplicate_sets")
+		results.append({"size": count, "tree": stats, "seconds": phases})
+		print("{:d} entries:".format(count), ", ".join(
+			"{:s} {:.3f} ms".format(name, phases[name] * 1e3)
+			for name in SUITE_PHASES),
+			file=sys.stderr)
+
+	report = {
+		"format": SUITE_FORMAT,
+		"commit": get_commit(),
+		"python": platform.python_version(),
+		"seed": args.seed,
+		"repeat": args.repeat,
+		"duplicate_rate": args.duplicate_rate,
+		"results": results,
+	}
+	if args.output == "-":
+		json.dump(report, sys.stdout, indent=1, sort_keys=True)
+		sys.stdout.write("\n")
+	else:
+		with open(args.output, "w") as f:
+			json.dump(report, f, indent=1, sort_keys=True)
+			f.write("\n")
+
+
+def check_tree(dirname, stats):
+	"""Compares the numbers of valid enabled entries, empty files and duplicate
+	entries that the pipeline finds in a synthetic tree with those of its
+	generator.
+
+	Returns a list of descriptions of the mismatches.
+	"""
+
+	sourceslist = SourcesListView()
+	load_sources_dir(sourceslist, dirname)
+	found = {
+		"entries": sum(
+			not (se.invalid or se.disabled) for se in sourceslist.list),
+		"empty_files": sum(
+			1 for _ in aptsources_cleanup.get_empty_files(sourceslist)),
+		"duplicates": len({
+			id(overlap.second)
+			for overlap in aptsources_cleanup.get_overlaps(
+				sourceslist, SUITE_EQUIVALENT_SCHEMES)
+		}),
+	}
+	return [
+		"{:s} {:d} instead of {:d}".format(name, n, stats[name])
+		for name, n in sorted(found.items()) if n != stats[name]
+	]
+
+
+def run_suite_phases(dirname, repeat):
+	"""Returns the best times of the stages of the pipeline on a tree
+
+	in a dictionary keyed by the names in SUITE_PHASES. Each stage works on the
+	result of the preceding one. Duplicate detection starts with cleared
+	normalization caches.
+	"""
+
+	equivalent_schemes = SUITE_EQUIVALENT_SCHEMES
+	sourceslist = SourcesListView()
+	phases = {}
+
+	phases["load_sources_dir"] = timeit(
+		lambda: load_sources_dir(sourceslist, dirname), repeat)
+
+	dupe_sets = None
+	def get_duplicates():
+		nonlocal dupe_sets
+		dupe_sets = tuple(
+			aptsources_cleanup.get_duplicates(sourceslist, equivalent_schemes))
+	def clear_caches():
+		aptsources_cleanup._normalize_source_entry.cache_clear()
+		aptsources_cleanup._intern_key.cache_clear()
+	phases["get_duplicates"] = timeit(get_duplicates, repeat, clear_caches)
+	phases["duplicate_sets"] = len(dupe_sets)
+
+	phases["get_overlaps"] = timeit(
+		lambda: tuple(aptsources_cleanup.get_overlaps(
+			sourceslist, equivalent_schemes)),
+		repeat, clear_caches)
+
+	phases["get_empty_files"] = timeit(
+		lambda: tuple(aptsources_cleanup.get_empty_files(sourceslist)), repeat)
+
+	phases["sort_dupe_set_by_scheme_class"] = timeit(
+		lambda: [
+			sort_dupe_set_by_scheme_class(equivalent_schemes, list(dupe_set))
+			for dupe_set in dupe_sets],
+		repeat)
+
+	# Toggle the duplicates of each set before every save so that each run
+	# writes the same files.
+	dupes = {
+		id(dupe): dupe
+		for dupe_set in dupe_sets
+		for dupe in sort_dupe_set_by_scheme_class(
+			equivalent_schemes, list(dupe_set))[1:]
+	}
+	def toggle_dupes():
+		for dupe in dupes.values():
+			dupe.disabled = not dupe.disabled
+	phases["save"] = timeit(
+		lambda: sourceslist.save(sync=False), repeat, toggle_dupes)
+
+	return phases
+
+
+def bench_compare(args):
+	"""Compares two JSON reports of the 'suite' benchmark and fails if any stage
+	got slower than the threshold.
+	"""
+
+	reports = []
+	for path in (args.baseline, args.current):
+		with open(path) as f:
+			report = json.load(f)
+		if report.get("format") != SUITE_FORMAT:
+			print("Unsupported report format:", path, file=sys.stderr)
+			return 2
+		reports.append(
+			{result["size"]: result["seconds"] for result in report["results"]})
+
+	baseline, current = reports
+	regressions = 0
+	for size in sorted(baseline.keys() & current.keys()):
+		for phase in SUITE_PHASES:
+			old = baseline[size].get(phase)
+			new = current[size].get(phase)
+			if old is None or new is None:
+				continue
+			ratio = new / old if old else float("inf")
+			regressed = ratio > 1 + args.threshold
+			regressions += regressed
+			print("{:>9d} {:<30s} {:10.3f} ms {:10.3f} ms {:6.2f}x{:s}".format(
+				size, phase, old * 1e3, new * 1e3, ratio,
+				"  REGRESSION" if regressed else ""))
+
+	return 1 if regressions else 0
+
+
+def get_commit():
+	"""Returns the commit hash of the repository or None."""
+
+	try:
+		return subprocess.run(("git", "rev-parse", "HEAD"),
+			cwd=REPO_ROOT, check=True, universal_newlines=True,
+			stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.strip()
+	except (EnvironmentError, subprocess.CalledProcessError):
+		return None
+
+
+def write_synthetic_tree(dirname, count, dir_count=1, line_count=10, seed=0):
+	"""Writes 'count' sources list files with 'line_count' lines each, spread
+	over 'dir_count' directories, and returns their paths.
+	"""
+
+	entries = make_synthetic_entries(count * line_count, seed)
+	files = []
+	for i in range(count):
+		subdir = os.path.join(dirname, "d{:d}".format(i % dir_count))
+		os.makedirs(subdir, exist_ok=True)
+		file = os.path.join(subdir, "{:d}.list".format(i))
+		with open(file, "w") as f:
+			for se in entries[i * line_count:(i + 1) * line_count]:
+				print(se.line, file=f)
+		files.append(file)
+	return files
+
+
+def find_sources_files(paths):
+	"""Returns the given sources list files and those inside the given
+	directories.
+	"""
+
+	files = []
+	for path in paths:
+		if os.path.isdir(path):
+			files += sorted(itertools.chain.from_iterable(
+				glob.iglob(os.path.join(path, pattern), recursive=True)
+				for pattern in ("**/*.list", "**/*.sources")))
+		else:
+			files.append(path)
+	return files
+
+
+def parse_args(args=None):
+	ap = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+	ap.add_argument("-r", "--repeat", metavar="N",
+		type=int, default=3,
+		help="Report the best time of N runs.")
+	ap.add_argument("--seed", metavar="N",
+		type=int, default=0,
+		help="Seed for the generation of synthetic data.")
+	subparsers = ap.add_subparsers(dest="benchmark")
+	subparsers.required = True
+
+	sp = subparsers.add_parser("normalize", help=bench_normalize.__doc__)
+	sp.set_defaults(func=bench_normalize)
+	sp.add_argument("-n", "--count", metavar="N",
+		type=int, default=100000,
+		help="Number of synthetic source entries")
+	sp.add_argument("--mirrors", metavar="N",
+		type=int, default=300,
+		help="Number of distinct synthetic mirror URIs")
+
+	sp = subparsers.add_parser("parse", help=bench_parse.__doc__)
+	sp.set_defaults(func=bench_parse)
+	add_paths_argument(sp)
+	sp.add_argument("-n", "--count", metavar="N",
+		type=int, default=20,
+		help="Parse all files N times per run.")
+
+	sp = subparsers.add_parser("scancache", help=bench_scan_cache.__doc__)
+	sp.set_defaults(func=bench_scan_cache)
+	add_paths_argument(sp)
+	sp.add_argument("-n", "--count", metavar="N",
+		type=int, default=20,
+		help="Load all files N times per run.")
+	sp.add_argument("--hash", action="store_true",
+		help="Compare content hashes of cached files too.")
+
+	sp = subparsers.add_parser("save", help=bench_save.__doc__)
+	sp.set_defaults(func=bench_save)
+	sp.add_argument("-n", "--count", metavar="N",
+		type=int, default=500,
+		help="Number of synthetic sources list files")
+	sp.add_argument("--dirs", metavar="N",
+		type=int, default=1,
+		help="Number of directories to spread the files over")
+	sp.add_argument("--lines", metavar="N",
+		type=int, default=10,
+		help="Number of entries per file")
+
+	sp = subparsers.add_parser("suite", help=bench_suite.__doc__)
+	sp.set_defaults(func=bench_suite)
+	sp.add_argument("-s", "--sizes", metavar="N",
+		type=int, nargs="+", default=(10, 1000, 100000),
+		help="Numbers of enabled source entries of the synthetic trees")
+	sp.add_argument("--duplicate-rate", metavar="P",
+		type=float, default=0.1,
+		help="Probability of an entry duplicating an earlier one")
+	sp.add_argument("-o", "--output", metavar="FILE",
+		default="-",
+		help="Write the JSON report to FILE instead of standard output.")
+
+	sp = subparsers.add_parser("compare", help=bench_compare.__doc__)
+	sp.set_defaults(func=bench_compare)
+	sp.add_argument("baseline", metavar="BASELINE")
+	sp.add_argument("current", metavar="CURRENT")
+	sp.add_argument("--threshold", metavar="R",
+		type=float, default=0.1,
+		help="Tolerated relative slow-down of each stage")
+
+	return ap.parse_args(args)
+
+
+def add_paths_argument(parser):
+	parser.add_argument("paths", metavar="PATH", nargs="*",
+		default=tuple(
+			os.path.join(REPO_ROOT, "test", name)
+			for name in ("sources.list", "sources.list.d")),
+		help="Sources list files or directories to load")
+
+
+def main(args=None):
+	args = parse_args(args)
+	return args.func(args)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
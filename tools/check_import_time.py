@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# -*- coding: utf-8
+
+"""Checks the cold start import time of aptsources-cleanup against a budget
+
+Runs the program with 'python3 -X importtime' a few times and fails if the
+best total import time exceeds the budget or if any module that should only
+be loaded on demand was imported.
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = (
+	"curses", "regex", "zipfile", "tempfile", "hashlib", "aptsources", "apt_pkg",
+	"aptsources_cleanup.scancache")
+
+
+def measure(python, args):
+	"""Returns a list of pairs of the names and cumulative import times in
+	microseconds of the top-level imports of a program run.
+	"""
+
+	env = dict(os.environ)
+	env["PYTHONPATH"] = os.pathsep.join(filter(None,
+		(os.path.join(REPO_ROOT, "src"), env.get("PYTHONPATH"))))
+	proc = subprocess.run(
+		(python, "-X", "importtime", "-m", "aptsources_cleanup") + tuple(args),
+		env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+		stderr=subprocess.PIPE, universal_newlines=True)
+
+	imports = []
+	for line in proc.stderr.splitlines():
+		if not line.startswith("import time:"):
+			continue
+		_, cumulative, name = line[len("import time:"):].split("|")
+		try:
+			cumulative = int(cumulative)
+		except ValueError:
+			continue # the header line
+		imports.append((name[1:], cumulative))
+	return imports
+
+
+def main(args=None):
+	ap = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+	ap.add_argument("-b", "--budget", metavar="MS",
+		type=float, default=80,
+		help="Maximum total import time in milliseconds (default: %(default)s; "
+			"starting up with the eager imports took about 100 ms)")
+	ap.add_argument("-r", "--repeat", metavar="N",
+		type=int, default=5,
+		help="Use the best of N runs (default: %(default)s)")
+	ap.add_argument("--top", metavar="N",
+		type=int, default=10,
+		help="Print the N slowest top-level imports (default: %(default)s)")
+	ap.add_argument("--python", metavar="EXE",
+		default=sys.executable,
+		help="Python interpreter to use (default: %(default)s)")
+	ap.add_argument("program_args", metavar="ARG", nargs="*",
+		default=("--version",),
+		help="Program arguments (default: --version)")
+	args = ap.parse_args(args)
+
+	best = None
+	for _ in range(args.repeat):
+		imports = measure(args.python, args.program_args)
+		total = sum(t for name, t in imports if not name.startswith(" "))
+		if best is None or total < best[0]:
+			best = (total, imports)
+	total, imports = best
+
+	top_level = sorted(
+		((name, t) for name, t in imports if not name.startswith(" ")),
+		key=lambda item: item[1], reverse=True)
+	for name, t in top_level[:args.top]:
+		print("{:10.3f} ms  {:s}".format(t / 1e3, name))
+
+	rv = 0
+	imported = frozenset(name.strip() for name, _ in imports)
+	eager = [name for name in LAZY_MODULES if name in imported]
+	if eager:
+		print("Modules imported eagerly:", ", ".join(eager), file=sys.stderr)
+		rv = 1
+
+	print("Total import time: {:.3f} ms (budget {:.3f} ms)".format(
+		total / 1e3, args.budget))
+	if total > args.budget * 1e3:
+		print("Import time budget exceeded.", file=sys.stderr)
+		rv = 1
+	return rv
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+# -*- coding: utf-8
+
+"""Compiles an equivalence relation file for '--equivalent-schemes-from' or
+'--equivalent-hosts-from'
+
+The compiled file is read without merging and validating the classes again.
+See the documentation of the 'aptsources_cleanup.util.relations' module for
+the input format.
+"""
+
+import os
+import sys
+import argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+
+from aptsources_cleanup.util.relations import (
+	EquivalenceRelation, HostEquivalenceRelation)
+
+
+def main(args=None):
+	ap = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+	ap.add_argument("kind", choices=("schemes", "hosts"))
+	ap.add_argument("input", metavar="INPUT")
+	ap.add_argument("output", metavar="OUTPUT")
+	args = ap.parse_args(args)
+
+	try:
+		if args.kind == "schemes":
+			relation = EquivalenceRelation.load(args.input, settype="ordered")
+		else:
+			relation = HostEquivalenceRelation.load(args.input)
+		relation.save(args.output)
+	except (EnvironmentError, ValueError) as ex:
+		print("{:s}: {!s}".format(ap.prog, ex), file=sys.stderr)
+		return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+# -*- coding: utf-8
+
+"""Generates realistic synthetic Apt sources list trees
+
+A tree consists of a 'sources.list' file with archive mirror entries and a
+'sources.list.d' directory with PPA, vendor and mirror files in the one-line
+and the deb822 format. Like on real systems there are commented-out entries,
+explanatory comments, '.save' companions of some files and files without
+enabled entries. A share of the entries duplicates earlier entries, sometimes
+with an equivalent URI scheme or a trailing slash. The same arguments always
+yield the same tree.
+"""
+
+import os
+import sys
+import random
+import argparse
+
+
+SUITES = ("bionic", "focal", "jammy", "noble")
+
+POCKETS = ("", "-updates", "-security", "-backports")
+
+COMPONENTS = (
+	("main",), ("main", "restricted"), ("universe",), ("multiverse",),
+	("main", "restricted", "universe", "multiverse"))
+
+COUNTRIES = ("de", "fr", "us", "uk", "nl", "be", "se", "jp", "br", "au")
+
+PROSE = (
+	"## N.B. software from this repository is ENTIRELY UNSUPPORTED by the "
+		"Ubuntu\n## team.\n",
+	"# See http://help.ubuntu.com/community/UpgradeNotes for how to upgrade "
+		"to\n# newer versions of the distribution.\n",
+	"## Major bug fix updates produced after the final release of the\n"
+		"## distribution.\n",
+)
+
+
+class TreeGenerator:
+	"""Generates the entries and files of a synthetic sources list tree
+
+	'duplicate_rate' is the probability of an entry duplicating an earlier one,
+	'comment_rate' the probability of a commented-out entry following an entry,
+	'empty_rate' the share of files without enabled entries, 'save_rate' the
+	share of '.list' files with a '.save' companion and 'deb822_rate' the share
+	of '.sources' files in 'sources.list.d'.
+	"""
+
+	def __init__(self, seed=0, duplicate_rate=0.1, entries_per_file=4,
+		comment_rate=0.3, empty_rate=0.02, save_rate=0.5, deb822_rate=0.1,
+		pool_size=4096
+	):
+		self.rng = random.Random(seed)
+		self.duplicate_rate = duplicate_rate
+		self.entries_per_file = entries_per_file
+		self.comment_rate = comment_rate
+		self.empty_rate = empty_rate
+		self.save_rate = save_rate
+		self.deb822_rate = deb822_rate
+		self.pool_size = pool_size
+		self.pool = []
+		self.serial = 0
+		self.duplicates = 0
+
+
+	def new_entry(self, kind):
+		"""Returns a tuple of type, options, URI, suite and components of an
+		entry that didn't occur before.
+		"""
+
+		rng = self.rng
+		n = self.serial
+		self.serial += 1
+		suite = rng.choice(SUITES)
+
+		if kind == "ppa":
+			return ("deb", (),
+				"http://ppa.launchpad.net/owner{:d}/ppa{:d}/ubuntu".format(n % 997, n),
+				suite, ("main",))
+		if kind == "vendor":
+			return ("deb",
+				("arch=amd64",
+					"signed-by=/usr/share/keyrings/vendor{:d}.gpg".format(n)),
+				"https://download.vendor{:d}.example.com/linux/debian".format(n),
+				rng.choice(("stable", suite)), ("main",))
+		return ("deb", (),
+			"http://mirror{:d}.{:s}.example.net/ubuntu/".format(
+				n, rng.choice(COUNTRIES)),
+			suite + rng.choice(POCKETS), rng.choice(COMPONENTS))
+
+
+	def next_entry(self, kind):
+		"""Returns a new entry or, with probability 'duplicate_rate', a variant
+		of an earlier one.
+		"""
+
+		rng = self.rng
+		if self.pool and rng.random() < self.duplicate_rate:
+			self.duplicates += 1
+			type, options, uri, suite, comps = rng.choice(self.pool)
+			variant = rng.randrange(3)
+			if variant == 1:
+				uri = (uri.replace("http://", "https://", 1)
+					if uri.startswith("http://")
+					else uri.replace("https://", "http://", 1))
+			elif variant == 2:
+				uri = uri[:-1] if uri.endswith("/") else uri + "/"
+			return (type, options, uri, suite, comps[:rng.randint(1, len(comps))])
+
+		entry = self.new_entry(kind)
+		if len(self.pool) < self.pool_size:
+			self.pool.append(entry)
+		else:
+			self.pool[rng.randrange(self.pool_size)] = entry
+		return entry
+
+
+	def write_tree(self, root, count):
+		"""Writes a tree with 'count' enabled entries below 'root'
+
+		and returns a dictionary with the numbers of files, entries, duplicates
+		and bytes written.
+		"""
+
+		rng = self.rng
+		partsdir = os.path.join(root, "sources.list.d")
+		os.makedirs(partsdir, exist_ok=True)
+		stats = {"files": 0, "save_files": 0, "empty_files": 0, "bytes": 0}
+		written = 0
+
+		main_count = min(count, 12)
+		self._write_file(os.path.join(root, "sources.list"),
+			self.format_lines(
+				[self.next_entry("mirror") for _ in range(main_count)]),
+			stats)
+		written += main_count
+
+		i = 0
+		while written < count or i == 0:
+			kind = rng.choice(("ppa", "ppa", "ppa", "vendor", "mirror"))
+			name = "{:s}-{:d}".format(kind, i)
+			i += 1
+
+			if rng.random() < self.empty_rate:
+				entries = [self.new_entry(kind)]
+				self._write_file(os.path.join(partsdir, name + ".list"),
+					"".join("# " + line for line in self.format_lines(entries)),
+					stats)
+				stats["empty_files"] += 1
+				continue
+
+			n = min(count - written, rng.randint(1, 2 * self.entries_per_file - 1))
+			entries = [self.next_entry(kind) for _ in range(n)]
+			written += n
+			if rng.random() < self.deb822_rate:
+				self._write_file(os.path.join(partsdir, name + ".sources"),
+					self.format_stanzas(entries), stats)
+			else:
+				content = self.format_lines(entries)
+				path = os.path.join(partsdir, name + ".list")
+				self._write_file(path, content, stats)
+				if rng.random() < self.save_rate:
+					self._write_file(path + ".save", content, stats)
+					stats["save_files"] += 1
+
+		stats["entries"] = written
+		stats["duplicates"] = self.duplicates
+		return stats
+
+
+	def format_lines(self, entries):
+		"""Returns the lines of a one-line style file with the given entries"""
+
+		rng = self.rng
+		lines = []
+		for type, options, uri, suite, comps in entries:
+			if rng.random() < self.comment_rate / 4:
+				lines.append(rng.choice(PROSE))
+			line = " ".join(filter(None, (
+				type, options and "[{:s}]".format(" ".join(options)), uri, suite,
+				" ".join(comps))))
+			lines.append(line + "\n")
+			if rng.random() < self.comment_rate:
+				lines.append("# deb-src" + line[len(type):] + "\n")
+		return lines
+
+
+	def format_stanzas(self, entries):
+		"""Returns the content of a deb822 style file with the given entries"""
+
+		stanzas = []
+		for type, options, uri, suite, comps in entries:
+			stanza = [
+				"Types: " + type, "URIs: " + uri, "Suites: " + suite,
+				"Components: " + " ".join(comps)]
+			for option in options:
+				key, _, value = option.partition("=")
+				stanza.append("{:s}: {:s}".format(key.title(), value))
+			stanzas.append("\n".join(stanza) + "\n")
+		return "\n".join(stanzas)
+
+
+	@staticmethod
+	def _write_file(path, content, stats):
+		data = "".join(content).encode()
+		with open(path, "wb") as f:
+			f.write(data)
+		stats["files"] += 1
+		stats["bytes"] += len(data)
+
+
+def generate_tree(root, count, seed=0, **kwargs):
+	"""Writes a synthetic tree with 'count' enabled entries below 'root'
+
+	See TreeGenerator for the keyword arguments and its write_tree() method for
+	the return value.
+	"""
+
+	return TreeGenerator(seed, **kwargs).write_tree(root, count)
+
+
+def main(args=None):
+	ap = argparse.ArgumentParser(description=__doc__.partition("\n\n")[0])
+	ap.add_argument("root", metavar="DIR",
+		help="Directory to write the tree to")
+	ap.add_argument("-n", "--count", metavar="N",
+		type=int, default=1000,
+		help="Number of enabled source entries")
+	ap.add_argument("--seed", metavar="N",
+		type=int, default=0,
+		help="Seed of the pseudo-random generator")
+	ap.add_argument("--duplicate-rate", metavar="P",
+		type=float, default=0.1,
+		help="Probability of an entry duplicating an earlier one")
+	args = ap.parse_args(args)
+
+	stats = generate_tree(args.root, args.count, args.seed,
+		duplicate_rate=args.duplicate_rate)
+	print(", ".join(
+		"{:s}: {:d}".format(key, value) for key, value in sorted(stats.items())))
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())